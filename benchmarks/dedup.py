@@ -0,0 +1,29 @@
+import os
+import sys
+import random
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.dedup import media_key
+
+
+def main(size=100_000, lookups=2_000):
+    urls = [f'https://cdn.loyalfans.com/media/{i:08x}/original.jpg?token={i}'
+            for i in range(size)]
+    keys = [media_key(url) for url in urls]
+    probes = random.sample(keys, lookups // 2) + \
+        [f'/media/missing/{i}.jpg' for i in range(lookups // 2)]
+    as_list = list(keys)
+    as_set = set(keys)
+    list_time = timeit.timeit(
+        lambda: [key in as_list for key in probes], number=1)
+    set_time = timeit.timeit(
+        lambda: [key in as_set for key in probes], number=1)
+    print(f"{size} ids, {lookups} lookups")
+    print(f"\tlist: {list_time:.4f}s")
+    print(f"\tset:  {set_time:.4f}s ({list_time / set_time:.0f}x faster)")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
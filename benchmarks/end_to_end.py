@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_server import Creator, MockLoyalFans
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULTS = ['network.requests_per_second=0', 'settings.batch_creators=4']
+RUNS = {'cold': [], 'cached': [], 'uncached': ['cache.enabled=false']}
+
+
+def write_config(directory, mock, overrides):
+    with open(os.path.join(ROOT, 'config.json')) as f:
+        config = json.load(f)
+    config['config']['urls'] = mock.urls()
+    config['config']['settings']['destination_path'] = os.path.join(directory, 'out')
+    for override in overrides:
+        key, value = override.split('=', 1)
+        section, option = key.split('.')
+        config['config'][section][option] = json.loads(value)
+    with open(os.path.join(directory, 'config.json'), 'w') as f:
+        json.dump(config, f, indent=4)
+
+
+def run(directory, slugs):
+    script = f'import loyalfans; loyalfans.batch({slugs!r})'
+    env = {**os.environ, 'PYTHONPATH': ROOT}
+    with open(os.path.join(directory, 'run.log'), 'ab') as log:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, '-c', script],
+                                   cwd=directory, env=env, stdout=log, stderr=log)
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(
+            f"loyalfans exited with {process.returncode}, see {os.path.join(directory, 'run.log')}")
+    peak = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return elapsed, peak
+
+
+def benchmark(args, posts, rerun=False):
+    creators = [Creator(f'creator{i}', posts) for i in range(args.creators)]
+    mock = MockLoyalFans(creators, args.latency, args.bandwidth, args.error_rate,
+                         args.image_size, args.video_size, args.audio_size)
+    results = []
+    with mock, tempfile.TemporaryDirectory(dir=args.workdir) as directory:
+        for label in RUNS if rerun else ('cold',):
+            write_config(directory, mock, DEFAULTS + args.set + RUNS[label])
+            mock.stats.clear()
+            elapsed, peak = run(directory, list(mock.creators))
+            requests = sum(stats['requests'] for stats in mock.stats.values())
+            received = sum(stats['bytes'] for stats in mock.stats.values())
+            results.append({
+                'posts': posts,
+                'run': label,
+                'seconds': round(elapsed, 2),
+                'requests_per_creator': round(requests / args.creators, 1),
+                'peak_rss_mb': round(peak, 1),
+                'mb_per_s': round(received / elapsed / 1e6, 2),
+                'errors': sum(stats['errors'] for stats in mock.stats.values()),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run loyalfans end to end against a local stand-in for LoyalFans')
+    parser.add_argument('--posts', default='100,10000,100000',
+                        help="comma separated number of posts per creator")
+    parser.add_argument('--creators', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help="seconds added to every response")
+    parser.add_argument('--bandwidth', type=float, default=0,
+                        help="bytes per second per media download, 0 for unlimited")
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help="fraction of requests answered with 429 or 503")
+    parser.add_argument('--image-size', type=int, default=4096)
+    parser.add_argument('--video-size', type=int, default=32768)
+    parser.add_argument('--audio-size', type=int, default=16384)
+    parser.add_argument('--set', action='append', default=[], metavar='SECTION.OPTION=JSON',
+                        help="override a config.json option, e.g. network.threads=16")
+    parser.add_argument('--rerun', action='store_true',
+                        help="run again against the same folder to time incremental runs, "
+                             "once answered from the API cache and once without it")
+    parser.add_argument('--workdir', default=None,
+                        help="where the temporary download folders are created")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args()
+    results = []
+    for posts in map(int, args.posts.split(',')):
+        runs = benchmark(args, posts, args.rerun)
+        results.extend(runs)
+        if not args.json:
+            for result in runs:
+                print(f"{result['posts']:>7} posts ({result['run']}): {result['seconds']:.2f}s, "
+                      f"{result['requests_per_creator']:.0f} requests per creator, "
+                      f"{result['peak_rss_mb']:.1f} MB peak RSS, {result['mb_per_s']:.2f} MB/s")
+    if args.json:
+        print(json.dumps(results, indent=4))
+
+
+if __name__ == '__main__':
+    main()
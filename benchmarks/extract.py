@@ -0,0 +1,65 @@
+import os
+import sys
+import json
+import time
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dateutil.parser import parse
+
+from media.extract import extract_post
+
+
+def synthetic_timeline(size):
+    posts = []
+    for i in range(size):
+        date = datetime.datetime(2020, 1, 1) + datetime.timedelta(minutes=37 * i)
+        posts.append({
+            'uid': f'{i:010x}',
+            'created_at': {'date': date.strftime('%Y-%m-%d %H:%M:%S.%f'), 'timezone_type': 3, 'timezone': 'UTC'},
+            'photo': i % 2 == 0,
+            'video': i % 3 == 0,
+            'audio': i % 11 == 0,
+            'photos': {'photos': [{'images': {'original': f'https:\\/\\/cdn.loyalfans.com\\/{i}\\/{j}.jpg'}} for j in range(3)]},
+            'video_object': {'video_url': f'https:\\/\\/cdn.loyalfans.com\\/{i}.mp4'},
+            'audio_object': {'audio_url': f'https:\\/\\/cdn.loyalfans.com\\/{i}.mp3'},
+        })
+    return json.dumps({'timeline': posts})
+
+
+def legacy_extract(posts):
+    items = []
+    for post in posts:
+        if post['photo'] and 'photos' in post['photos']:
+            ts = parse(post['created_at']['date']).timestamp()
+            for photo in post['photos']['photos']:
+                items.append((photo['images']['original'].replace('\\', ''), ts, 'Timeline',
+                              'Image', post['created_at']['date'], post['uid']))
+        if post['video'] and 'video_url' in post['video_object']:
+            ts = parse(post['created_at']['date']).timestamp()
+            items.append((post['video_object']['video_url'].replace('\\', ''), ts, 'Timeline',
+                          'Video', post['created_at']['date'], post['uid']))
+        if post['audio'] and 'audio_url' in post['audio_object']:
+            ts = parse(post['created_at']['date']).timestamp()
+            items.append((post['audio_object']['audio_url'].replace('\\', ''), ts, 'Timeline',
+                          'Audio', post['created_at']['date'], post['uid']))
+    return items
+
+
+def main(size=50_000):
+    posts = json.loads(synthetic_timeline(size))['timeline']
+    start = time.perf_counter()
+    legacy = legacy_extract(posts)
+    legacy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    media = [m for post in posts for m in extract_post(post, True)]
+    extract_time = time.perf_counter() - start
+    assert [tuple(m) for m in media] == legacy
+    print(f"{size} posts, {len(media)} media items")
+    print(f"\tdateutil per branch: {legacy_time:.3f}s")
+    print(f"\textract_post:        {extract_time:.3f}s ({legacy_time / extract_time:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,294 @@
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import datetime
+import threading
+import collections
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+START = datetime.datetime(2022, 1, 1)
+MESSAGES_PAGE = 10
+MAGIC = {
+    'jpg': b'\xff\xd8\xff\xe0',
+    'mp4': b'\x00\x00\x00\x18ftypmp42',
+    'mp3': b'ID3\x04',
+}
+
+
+class Creator:
+    def __init__(self, slug, posts, messages=None, store_videos=None):
+        self.slug = slug
+        self.posts = posts
+        self.messages = posts // 10 if messages is None else messages
+        self.store_videos = posts // 50 if store_videos is None else store_videos
+
+    def date(self, i, total):
+        date = START + datetime.timedelta(minutes=37 * (total - i))
+        return {'date': date.strftime('%Y-%m-%d %H:%M:%S.%f'),
+                'timezone_type': 3, 'timezone': 'UTC'}
+
+    def cdn(self, base, name):
+        return f'{base}/cdn/{self.slug}/{name}'
+
+    def post(self, base, i):
+        return {
+            'uid': f'{self.slug}-p{i}',
+            'created_at': self.date(i, self.posts),
+            'photo': True,
+            'video': i % 5 == 0,
+            'audio': i % 20 == 0,
+            'photos': {'photos': [{'images': {'original': self.cdn(base, f'p{i}.jpg')}}]},
+            'video_object': {'video_url': self.cdn(base, f'p{i}.mp4')},
+            'audio_object': {'audio_url': self.cdn(base, f'p{i}.mp3')},
+        }
+
+    def message(self, base, i):
+        return {
+            'mid': f'{self.slug}-m{i}',
+            'created_at': self.date(i, self.messages),
+            'is_locked': False,
+            'has_images': True,
+            'has_video': i % 4 == 0,
+            'has_audio': False,
+            'images': [{'image': self.cdn(base, f'm{i}.jpg')}],
+            'video': self.cdn(base, f'm{i}.mp4'),
+        }
+
+    def store_video(self, base, i):
+        return {
+            'uid': f'{self.slug}-s{i}',
+            'title': f'Store video {i}',
+            'created_at': self.date(i, self.store_videos),
+            'can_see': True,
+            'video_object': {'video_url': self.cdn(base, f's{i}.mp4')},
+        }
+
+    def counters(self):
+        videos = len(range(0, self.posts, 5))
+        return {
+            'posts_total': self.posts,
+            'photos': self.posts,
+            'videos': videos + self.store_videos,
+            'audios': len(range(0, self.posts, 20)),
+            'store_videos': self.store_videos,
+        }
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, mock):
+        super().__init__(address, Handler)
+        self.mock = mock
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request(head=False)
+
+    def do_POST(self):
+        self.handle_request(head=False)
+
+    def do_HEAD(self):
+        self.handle_request(head=True)
+
+    def handle_request(self, head):
+        mock = self.server.mock
+        if length := int(self.headers.get('Content-Length') or 0):
+            self.rfile.read(length)
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        slug = mock.slug_of(url.path, query)
+        mock.count(slug, 'requests')
+        if mock.latency:
+            time.sleep(mock.latency)
+        if mock.error_rate and mock.random.random() < mock.error_rate:
+            mock.count(slug, 'errors')
+            return self.send(mock.random.choice((429, 503)), b'error',
+                             {'Retry-After': '0'})
+        if url.path.startswith('/cdn/'):
+            return self.send_media(mock, slug, url.path, head)
+        if (data := mock.api(url.path, query)) is None:
+            return self.send(404, b'')
+        self.send_json(data)
+
+    def send(self, status, body, headers=None, head=False):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def send_json(self, data):
+        body = json.dumps(data).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            return self.send(304, b'', {'ETag': etag})
+        self.send(200, body, {'ETag': etag, 'Content-Type': 'application/json'})
+
+    def send_media(self, mock, slug, path, head):
+        body = mock.media(path)
+        headers = {
+            'Accept-Ranges': 'bytes',
+            'ETag': f'"{hashlib.md5(path.encode()).hexdigest()}"',
+        }
+        status = 200
+        byte_range = self.headers.get('Range')
+        if self.headers.get('If-Range') not in (None, headers['ETag']):
+            byte_range = None
+        if byte_range:
+            first, last = byte_range.split('=')[1].split('-')
+            first, last = int(first), int(last) if last else len(body) - 1
+            if first >= len(body):
+                return self.send(416, b'', {'Content-Range': f'bytes */{len(body)}'})
+            headers['Content-Range'] = f'bytes {first}-{last}/{len(body)}'
+            body, status = body[first:last + 1], 206
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if head:
+            return
+        step = 64 * 1024
+        for offset in range(0, len(body), step):
+            chunk = body[offset:offset + step]
+            self.wfile.write(chunk)
+            if mock.bandwidth:
+                time.sleep(len(chunk) / mock.bandwidth)
+        mock.count(slug, 'bytes', len(body))
+
+
+class MockLoyalFans:
+    def __init__(self, creators, latency=0, bandwidth=0, error_rate=0,
+                 image_size=4096, video_size=32768, audio_size=16384,
+                 host='127.0.0.1', port=0, seed=0):
+        self.creators = {creator.slug: creator for creator in creators}
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.sizes = {'jpg': image_size, 'mp4': video_size, 'mp3': audio_size}
+        self.random = random.Random(seed)
+        self.stats = collections.defaultdict(collections.Counter)
+        self.lock = threading.Lock()
+        self.server = Server((host, port), self)
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def urls(self):
+        base = self.base_url
+        return {
+            'user_url': f'{base}/api/v2/profile',
+            'follow_url': f'{base}/api/v1/follow',
+            'profile_url': f'{base}/api/v2/profile/star/{{}}/',
+            'timeline_url': f'{base}/api/v2/social/timeline/{{}}?limit={{}}&page={{}}/',
+            'messages_url': f'{base}/api/v1/messages/with/{{}}?timezone={{}}{{}}',
+            'video_store_url': f'{base}/api/v2/timeline/store',
+        }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, slug, key, amount=1):
+        with self.lock:
+            self.stats[slug][key] += amount
+
+    def slug_of(self, path, query):
+        if match := re.match(r'/(?:cdn|api/v2/profile/star|api/v2/social/timeline|api/v1/messages/with)/([^/?]+)', path):
+            return match.group(1)
+        return query.get('slug', '')
+
+    def api(self, path, query):
+        base = self.base_url
+        if path == '/api/v2/profile':
+            return {'following': len(self.creators)}
+        if path == '/api/v1/follow':
+            return {'followed': [{'name': slug, 'slug': slug} for slug in self.creators]}
+        if match := re.match(r'/api/v2/profile/star/([^/]+)/', path):
+            if creator := self.creators.get(match.group(1)):
+                return {'data': {'counters': creator.counters()}}
+        elif match := re.match(r'/api/v2/social/timeline/([^/]+)', path):
+            if creator := self.creators.get(match.group(1)):
+                limit = int(query.get('limit', 48))
+                page = int(query.get('page', '0').rstrip('/'))
+                posts = range(page * limit, min((page + 1) * limit, creator.posts))
+                return {'timeline': [creator.post(base, i) for i in posts]}
+        elif match := re.match(r'/api/v1/messages/with/([^/]+)', path):
+            if creator := self.creators.get(match.group(1)):
+                start = int(query.get('mid', 0))
+                end = min(start + MESSAGES_PAGE, creator.messages)
+                data = {'messages': [creator.message(base, i) for i in range(start, end)]}
+                if end < creator.messages:
+                    data['mid_token'] = str(end)
+                return data
+        elif path == '/api/v2/timeline/store':
+            if creator := self.creators.get(query.get('slug')):
+                limit = int(query.get('limit', 48))
+                page = int(query.get('page', 0))
+                videos = range(page * limit, min((page + 1) * limit, creator.store_videos))
+                return {'page_meta': {'total': creator.store_videos},
+                        'list': [creator.store_video(base, i) for i in videos]}
+        return None
+
+    def media(self, path):
+        extension = path.rsplit('.', 1)[-1]
+        size = self.sizes.get(extension, 4096)
+        seed = hashlib.sha256(path.encode()).digest()
+        return (MAGIC.get(extension, b'') + seed * (size // len(seed) + 1))[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve a stand-in LoyalFans API and media CDN')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--creators', type=int, default=2)
+    parser.add_argument('--posts', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0,
+                        help="seconds added to every response")
+    parser.add_argument('--bandwidth', type=float, default=0,
+                        help="bytes per second per media download, 0 for unlimited")
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help="fraction of requests answered with 429 or 503")
+    args = parser.parse_args()
+    creators = [Creator(f'creator{i}', args.posts) for i in range(args.creators)]
+    mock = MockLoyalFans(creators, args.latency, args.bandwidth,
+                         args.error_rate, port=args.port)
+    print(json.dumps({'config': {'urls': mock.urls()}}, indent=4))
+    try:
+        mock.start().thread.join()
+    except KeyboardInterrupt:
+        mock.stop()
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import hashlib
+import tempfile
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_server import Creator, MockLoyalFans
+from database.content import new_hasher
+from database.dedup import part_path
+from downloads.resume import Resumable
+from network.session import Session
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEGMENT_SIZE = 128 * 1024
+VIDEO_SIZE = 1000003
+IMAGE_SIZE = 50001
+IMAGE, OTHER_IMAGE, VIDEO = '/cdn/alice/p0.jpg', '/cdn/alice/p1.jpg', '/cdn/alice/p0.mp4'
+
+
+def get_resumable():
+    with open(os.path.join(ROOT, 'config.json')) as f:
+        config = json.load(f)['config']
+    network = {**config['network'], 'requests_per_second': 0, 'bandwidth': 0}
+    downloads = {**config['downloads'], 'segments': 4, 'segment_size': SEGMENT_SIZE}
+    return Resumable(Session({}, network), downloads)
+
+
+def etag_of(path):
+    return f'"{hashlib.md5(path.encode()).hexdigest()}"'
+
+
+def leftovers(directory):
+    return [name for name in os.listdir(directory) if '.part' in name]
+
+
+def check(name, mock, resumable, directory, path, prepare=None, split=True, retries=0):
+    url = mock.base_url + path
+    expected = mock.media(path)
+    location = os.path.join(directory, 'file' + os.path.splitext(path)[1])
+    foreign = prepare(mock, location, path) if prepare else None
+    mock.stats.clear()
+    for attempt in range(retries + 1):
+        try:
+            digest, _ = resumable.fetch(url, location, split=split)
+            break
+        except requests.HTTPError:
+            if attempt == retries:
+                raise
+    with open(location, 'rb') as f:
+        assert f.read() == expected, f"{name}: content differs"
+    hasher = new_hasher()
+    hasher.update(expected)
+    assert digest == hasher.hexdigest(), f"{name}: digest differs"
+    if foreign:
+        assert all(os.path.exists(p) for p in foreign), f"{name}: removed another file's .part"
+        for p in foreign:
+            os.remove(p)
+    assert not leftovers(directory), f"{name}: left {leftovers(directory)} behind"
+    stats = mock.stats['alice']
+    print(f"\t{name:<34} ok ({stats['requests']} requests, {stats['bytes']} bytes)")
+    os.remove(location)
+    return stats
+
+
+def partial_file(size, source=None, etag=None, extra=b''):
+    def prepare(mock, location, path):
+        origin = source or path
+        part = part_path(location, mock.base_url + origin)
+        with open(part, 'wb') as f:
+            f.write(mock.media(origin)[:size] + extra)
+        with open(f'{part}.etag', 'w') as f:
+            f.write(etag or etag_of(origin))
+        if origin != path:
+            return [part, f'{part}.etag']
+    return prepare
+
+
+def partial_segments(mock, location, path):
+    part = part_path(location, mock.base_url + path)
+    expected = mock.media(path)
+    step = -(-len(expected) // 4)
+    with open(f'{part}0', 'wb') as f:
+        f.write(expected[:step // 3])
+    with open(f'{part}2', 'wb') as f:
+        f.write(expected[2 * step:3 * step])
+    with open(f'{part}.etag', 'w') as f:
+        f.write(etag_of(path))
+
+
+def main():
+    mock = MockLoyalFans([Creator('alice', 2)], image_size=IMAGE_SIZE, video_size=VIDEO_SIZE)
+    resumable = get_resumable()
+    third = IMAGE_SIZE // 3
+    with mock, tempfile.TemporaryDirectory() as directory:
+        print("Resume and segment stitching against a local Range-capable server")
+        stats = check('image in one request', mock, resumable, directory, IMAGE, split=False)
+        assert stats['requests'] == 1, "small files shouldn't be probed"
+        stats = check('resume a .part file', mock, resumable, directory, IMAGE,
+                      partial_file(third), split=False)
+        assert stats['bytes'] == IMAGE_SIZE - third, "resumed from the start"
+        check('complete .part file (416)', mock, resumable, directory, IMAGE,
+              partial_file(IMAGE_SIZE), split=False)
+        stats = check('oversized .part file (416)', mock, resumable, directory, IMAGE,
+                      partial_file(IMAGE_SIZE, extra=b'junk'), split=False, retries=1)
+        assert stats['bytes'] == IMAGE_SIZE, "oversized .part was kept"
+        stats = check('changed ETag restarts', mock, resumable, directory, IMAGE,
+                      partial_file(third, etag='"stale"'), split=False)
+        assert stats['bytes'] == IMAGE_SIZE, "resumed a file that changed"
+        stats = check("other file's .part is ignored", mock, resumable, directory, IMAGE,
+                      partial_file(third, source=OTHER_IMAGE), split=False)
+        assert stats['bytes'] == IMAGE_SIZE, "resumed another file's .part"
+        stats = check('video in segments', mock, resumable, directory, VIDEO)
+        assert stats['requests'] == 5, "expected a probe and 4 ranges"
+        stats = check('resume interrupted segments', mock, resumable, directory, VIDEO,
+                      partial_segments, split=False)
+        step = -(-VIDEO_SIZE // 4)
+        assert stats['bytes'] == VIDEO_SIZE - step - step // 3, "segments restarted"
+        check('video in one request', mock, resumable, directory, VIDEO, split=False)
+    print("All checks passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import io
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.content import new_hasher
+from downloads.writer import Writer
+
+
+def legacy_write(source, path):
+    hasher = new_hasher()
+    with open(path, 'wb') as f:
+        while chunk := source.read(1024):
+            f.write(chunk)
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def writer_write(source, path, size):
+    hasher = new_hasher()
+    with Writer(path, size=size, hasher=hasher) as writer:
+        writer.copy(source)
+    return hasher.hexdigest()
+
+
+def main(megabytes=256):
+    data = os.urandom(1024 * 1024) * megabytes
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'file')
+        start, cpu = time.perf_counter(), time.process_time()
+        legacy = legacy_write(io.BytesIO(data), path)
+        legacy_time, legacy_cpu = time.perf_counter() - start, time.process_time() - cpu
+        os.remove(path)
+        start, cpu = time.perf_counter(), time.process_time()
+        digest = writer_write(io.BytesIO(data), path, len(data))
+        writer_time, writer_cpu = time.perf_counter() - start, time.process_time() - cpu
+    assert digest == legacy
+    print(f"{megabytes} MiB")
+    print(f"\t1 KiB chunks: {legacy_time:.3f}s ({legacy_cpu / megabytes * 1000:.2f} ms CPU per MiB)")
+    print(f"\tWriter:       {writer_time:.3f}s ({writer_cpu / megabytes * 1000:.2f} ms CPU per MiB, "
+          f"{legacy_cpu / writer_cpu:.1f}x less CPU)")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
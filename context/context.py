@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import threading
+
+from logs.logger import Logger
+from logs.metrics import Metrics
+from logs.terminal import get_terminal
+from database.database import Database
+from database.content import ContentStore
+from database.journal import Journal
+from database.profiles import Profiles
+from database.integrity import Integrity
+from network.session import Session
+from network.cache import ResponseCache
+from downloads.priority import Prioritizer
+from downloads.resume import Resumable
+from downloads.writer import Writer
+from media.verify import Verifier
+
+
+class Context:
+    _instance = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self):
+        with open(os.path.join(sys.path[0], 'config.json')) as f:
+            config = json.load(f)['config']
+        self.headers = config['headers']
+        if settings := config['settings']:
+            self.destination_path = settings['destination_path']
+            if not self.destination_path:
+                self.destination_path = os.getcwd()
+            self.separate_file_types = settings['separate_file_types']
+            self.download_preview_videos = settings['download_preview_videos']
+            self.avoid_duplicates = settings['avoid_duplicates']
+            self.use_original_dates = settings['use_original_dates']
+            self.timezone = settings['timezone']
+            self.debug = settings['debug']
+            self.pipeline = settings['pipeline']
+            self.batch_creators = settings['batch_creators']
+            self.incremental = settings['incremental']
+            self.page_size = settings['page_size']
+            self.prefetch_workers = settings['prefetch_workers']
+            self.batch_order = settings['batch_order']
+        if urls := config['urls']:
+            self.user_url = urls['user_url']
+            self.follow_url = urls['follow_url']
+            self.profile_url = urls['profile_url']
+            self.timeline_url = urls['timeline_url'].replace('&page=0/', '&page={}/')
+            if self.timeline_url.count('{}') != 3:
+                sys.exit("The timeline_url in config.json needs a {} for the handle, "
+                         "the page size and the page number")
+            self.messages_url = urls['messages_url']
+            self.video_store_url = urls['video_store_url']
+        if downloads := config['downloads']:
+            self.resume = downloads['resume']
+            self.hash_content = downloads['hash_content']
+            self.etag_check = downloads['etag_check']
+            self.max_attempts = downloads['max_attempts']
+            Writer.write_size = downloads['write_size']
+            Writer.preallocate = downloads['preallocate']
+            self.verify_workers = downloads['verify_workers']
+            self.verifier = Verifier(
+                self.verify_workers) if downloads['verify'] else None
+        if metrics := config['metrics']:
+            Metrics.enabled = metrics['enabled']
+            self.reports_dir = metrics['directory'] or os.path.join(
+                sys.path[0], 'reports')
+            self.report_formats = metrics['formats']
+            self.prometheus = metrics['prometheus']
+        if cache := config['cache']:
+            self.cache = ResponseCache(os.path.join(
+                sys.path[0], 'cache'), cache) if cache['enabled'] else None
+        if network := config['network']:
+            self.network = network
+            self.threads = network['threads']
+            self.engine = network['engine']
+            self.session = Session(self.headers, network, self.cache)
+            self.resumable = Resumable(self.session, downloads)
+            self.prioritizer = Prioritizer(self.session, downloads)
+        if self.avoid_duplicates:
+            self.db_dir = os.path.join(sys.path[0], 'db')
+            if not os.path.isdir(self.db_dir):
+                os.mkdir(self.db_dir)
+            self.db = Database(os.path.join(self.db_dir, 'models.db'))
+            self.content = ContentStore(self.db) if self.hash_content else None
+            self.journal = Journal(self.db, self.max_attempts)
+            self.profiles = Profiles(self.db)
+            self.integrity = Integrity(self.db)
+        else:
+            self.content = None
+            self.journal = None
+            self.profiles = None
+            self.integrity = None
+        self.log = Logger(self.debug)
+        self.term = get_terminal()
+        self._async_engine = None
+
+    @property
+    def async_engine(self):
+        with self._lock:
+            if self._async_engine is None:
+                from downloads.engine import AsyncEngine
+                self._async_engine = AsyncEngine(
+                    self.headers, self.network, self.session.scheduler,
+                    self.resume, self.use_original_dates)
+            return self._async_engine
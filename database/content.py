@@ -0,0 +1,81 @@
+import os
+import hashlib
+import threading
+
+from database.dedup import media_key
+
+
+def new_hasher():
+    return hashlib.sha256()
+
+
+def hash_file(path, hasher=None, chunk_size=1024 * 1024):
+    hasher = hasher or new_hasher()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            hasher.update(chunk)
+    return hasher
+
+
+class ContentStore:
+    _claims = {}
+    _lock = threading.Lock()
+
+    def __init__(self, db):
+        self.db = db
+
+    def claim(self, directory, filename, url):
+        key = media_key(url)
+        path = os.path.join(directory, filename)
+        with ContentStore._lock:
+            owner = ContentStore._claims.get(path) or self.owner(path)
+            if owner not in (None, key):
+                root, ext = os.path.splitext(filename)
+                suffix = hashlib.sha1(key.encode()).hexdigest()[:8]
+                path = os.path.join(directory, f'{root}-{suffix}{ext}')
+            ContentStore._claims[path] = key
+        return path
+
+    def owner(self, path):
+        rows = self.db.fetchall('SELECT key FROM files WHERE path = ?', (path,))
+        return rows[0][0] if rows else None
+
+    def find(self, digest, size, exclude):
+        rows = self.db.fetchall('''
+            SELECT path FROM files WHERE hash = ? AND size = ? AND path != ?''',
+            (digest, size, exclude))
+        for (path,) in rows:
+            if os.path.isfile(path) and os.path.getsize(path) == size:
+                return path
+        return None
+
+    def find_etag(self, etag, size):
+        rows = self.db.fetchall('''
+            SELECT path, hash FROM files WHERE etag = ? AND size = ?''', (etag, size))
+        for path, digest in rows:
+            if os.path.isfile(path) and os.path.getsize(path) == size:
+                return path, digest
+        return None
+
+    def store(self, url, path, digest, etag=None):
+        size = os.path.getsize(path)
+        linked = False
+        if existing := self.find(digest, size, path):
+            linked = self.link(existing, path)
+        self.db.execute('''
+            INSERT OR REPLACE INTO files(path, key, hash, size, etag)
+            VALUES(?,?,?,?,?)''', (path, media_key(url), digest, size, etag))
+        return linked
+
+    def link(self, source, target):
+        if os.path.exists(target) and os.path.samefile(source, target):
+            return True
+        temp = f'{target}.link'
+        try:
+            os.link(source, temp)
+            os.replace(temp, target)
+        except OSError:
+            if os.path.exists(temp):
+                os.remove(temp)
+            return False
+        return True
@@ -0,0 +1,157 @@
+import sqlite3
+import threading
+from contextlib import closing
+
+
+BATCH_SIZE = 100
+
+_columns = ('URL', 'TIMESTAMP', 'TYPE', 'MEDIA_TYPE', 'DATE', 'FILE_ID')
+
+
+class Database:
+    _conn = None
+    _pending = []
+    _writes = 0
+    _lock = threading.RLock()
+
+    def __init__(self, path, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        with Database._lock:
+            if Database._conn is None:
+                Database._conn = self._connect(path)
+        self.conn = Database._conn
+        self.lock = Database._lock
+
+    def _connect(self, path):
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        with closing(conn.cursor()) as c:
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS media(
+                    ID INTEGER PRIMARY KEY,
+                    SLUG TEXT,
+                    URL TEXT,
+                    TIMESTAMP INTEGER,
+                    TYPE TEXT,
+                    MEDIA_TYPE TEXT,
+                    DATE TEXT,
+                    FILE_ID TEXT
+            )''')
+            c.execute('''
+                CREATE INDEX IF NOT EXISTS media_slug_file_id
+                ON media(SLUG, FILE_ID)''')
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS files(
+                    PATH TEXT PRIMARY KEY,
+                    KEY TEXT,
+                    HASH TEXT,
+                    SIZE INTEGER,
+                    ETAG TEXT
+            )''')
+            c.execute('''
+                CREATE INDEX IF NOT EXISTS files_hash ON files(HASH, SIZE)''')
+            c.execute('''
+                CREATE INDEX IF NOT EXISTS files_etag ON files(ETAG)''')
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS jobs(
+                    SLUG TEXT,
+                    KEY TEXT,
+                    URL TEXT,
+                    TIMESTAMP INTEGER,
+                    TYPE TEXT,
+                    MEDIA_TYPE TEXT,
+                    DATE TEXT,
+                    FILE_ID TEXT,
+                    STATE TEXT,
+                    BYTES INTEGER,
+                    UPDATED INTEGER,
+                    ATTEMPTS INTEGER DEFAULT 0,
+                    PRIMARY KEY(SLUG, KEY)
+            )''')
+            c.execute('''
+                CREATE INDEX IF NOT EXISTS jobs_slug_state ON jobs(SLUG, STATE)''')
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS profiles(
+                    SLUG TEXT PRIMARY KEY,
+                    POSTS INTEGER,
+                    PHOTOS INTEGER,
+                    VIDEOS INTEGER,
+                    AUDIOS INTEGER,
+                    STORE_VIDEOS INTEGER,
+                    SYNCED INTEGER
+            )''')
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS listings(
+                    SLUG TEXT,
+                    LISTING TEXT,
+                    COMPLETED INTEGER,
+                    PRIMARY KEY(SLUG, LISTING)
+            )''')
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS verified(
+                    PATH TEXT PRIMARY KEY,
+                    STATUS TEXT,
+                    DETAIL TEXT,
+                    SIZE INTEGER,
+                    MTIME REAL,
+                    CHECKED INTEGER
+            )''')
+            self._migrate(c)
+        conn.commit()
+        return conn
+
+    def _migrate(self, c):
+        c.execute('PRAGMA table_info(jobs)')
+        if 'ATTEMPTS' not in (row[1].upper() for row in c.fetchall()):
+            c.execute('ALTER TABLE jobs ADD COLUMN ATTEMPTS INTEGER DEFAULT 0')
+        c.execute('''
+            SELECT name FROM sqlite_master
+            WHERE type='table' AND name NOT IN ('media', 'files', 'jobs', 'profiles', 'listings', 'verified', 'sqlite_sequence')
+        ''')
+        for (table,) in c.fetchall():
+            c.execute(f'PRAGMA table_info("{table}")')
+            if tuple(row[1].upper() for row in c.fetchall())[1:] != _columns:
+                continue
+            c.execute(f'''
+                INSERT INTO media(slug, url, timestamp, type, media_type, date, file_id)
+                SELECT ?, url, timestamp, type, media_type, date, file_id FROM "{table}"
+            ''', (table,))
+            c.execute(f'DROP TABLE "{table}"')
+
+    def fetchall(self, query, params=()):
+        with self.lock, closing(self.conn.cursor()) as c:
+            c.execute(query, params)
+            return c.fetchall()
+
+    def execute(self, query, params=()):
+        with self.lock:
+            with closing(self.conn.cursor()) as c:
+                c.execute(query, params)
+            Database._writes += 1
+            if Database._writes >= self.batch_size:
+                self.flush()
+
+    def record(self, slug, group):
+        with self.lock:
+            Database._pending.append((slug, *group))
+            if len(Database._pending) >= self.batch_size:
+                self.flush()
+
+    def forget(self, slug, url):
+        with self.lock:
+            self.flush()
+            with closing(self.conn.cursor()) as c:
+                c.execute('DELETE FROM media WHERE slug = ? AND url = ?', (slug, url))
+            self.conn.commit()
+
+    def flush(self):
+        with self.lock:
+            if Database._pending:
+                with closing(self.conn.cursor()) as c:
+                    c.executemany('''
+                    INSERT INTO media(slug, url, timestamp, type, media_type, date, file_id)
+                    VALUES(?,?,?,?,?,?,?)''', Database._pending)
+                Database._pending = []
+            self.conn.commit()
+            Database._writes = 0
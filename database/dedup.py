@@ -0,0 +1,35 @@
+import os
+import hashlib
+from urllib.parse import urlsplit
+
+
+def media_key(url):
+    return urlsplit(url.replace('\\', '')).path
+
+
+def part_path(file_location, url):
+    name = hashlib.sha1(media_key(url).encode()).hexdigest()[:16]
+    return os.path.join(os.path.dirname(file_location), f'{name}.part')
+
+
+class Dedup:
+    def __init__(self, db, slug, max_attempts=3):
+        self.db = db
+        self.slug = slug
+        rows = self.db.fetchall(
+            'SELECT url, file_id FROM media WHERE slug = ?', (self.slug,))
+        rows += self.db.fetchall('''
+            SELECT url, file_id FROM jobs
+            WHERE slug = ? AND (state != 'failed' OR attempts < ?)''', (self.slug, max_attempts))
+        self.keys = {media_key(url) for url, _ in rows}
+        self.ids = {file_id for _, file_id in rows}
+
+    def has_post(self, file_id):
+        return file_id in self.ids
+
+    def seen(self, url):
+        key = media_key(url)
+        if key in self.keys:
+            return True
+        self.keys.add(key)
+        return False
@@ -0,0 +1,18 @@
+import time
+
+from media.verify import OK
+
+
+class Integrity:
+    def __init__(self, db):
+        self.db = db
+
+    def record(self, path, status, detail, size, mtime):
+        self.db.execute('''
+            INSERT OR REPLACE INTO verified(path, status, detail, size, mtime, checked)
+            VALUES(?,?,?,?,?,?)''', (path, status, detail, size, mtime, int(time.time())))
+
+    def unchanged(self, path, size, mtime):
+        rows = self.db.fetchall('''
+            SELECT status, size, mtime FROM verified WHERE path = ?''', (path,))
+        return bool(rows) and rows[0] == (OK, size, mtime)
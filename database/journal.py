@@ -0,0 +1,53 @@
+import os
+import time
+
+from database.dedup import media_key, part_path
+from media.extract import Media
+
+
+DISCOVERED = 'discovered'
+IN_PROGRESS = 'in-progress'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Journal:
+    def __init__(self, db, max_attempts=3):
+        self.db = db
+        self.max_attempts = max_attempts
+
+    def discover(self, slug, group):
+        self.db.execute('''
+            INSERT INTO jobs(slug, key, url, timestamp, type, media_type, date, file_id, state, bytes, updated)
+            VALUES(?,?,?,?,?,?,?,?,?,0,?)
+            ON CONFLICT(slug, key) DO UPDATE SET
+                url = excluded.url, state = excluded.state, updated = excluded.updated
+            WHERE state = ?''',
+            (slug, media_key(group[0]), *group, DISCOVERED, int(time.time()), FAILED))
+
+    def update(self, slug, url, state, nbytes=0):
+        self.db.execute('''
+            UPDATE jobs SET state = ?, bytes = ?, updated = ?
+            WHERE slug = ? AND key = ?''',
+            (state, nbytes, int(time.time()), slug, media_key(url)))
+
+    def start(self, slug, url):
+        self.update(slug, url, IN_PROGRESS)
+
+    def done(self, slug, url, file_location):
+        self.update(slug, url, DONE, os.path.getsize(file_location))
+
+    def fail(self, slug, url, file_location):
+        part = part_path(file_location, url)
+        nbytes = os.path.getsize(part) if os.path.exists(part) else 0
+        self.db.execute('''
+            UPDATE jobs SET state = ?, bytes = ?, updated = ?, attempts = attempts + 1
+            WHERE slug = ? AND key = ?''',
+            (FAILED, nbytes, int(time.time()), slug, media_key(url)))
+
+    def outstanding(self, slug):
+        rows = self.db.fetchall('''
+            SELECT url, timestamp, type, media_type, date, file_id FROM jobs
+            WHERE slug = ? AND (state IN (?, ?) OR state = ? AND attempts < ?)''',
+            (slug, DISCOVERED, IN_PROGRESS, FAILED, self.max_attempts))
+        return [Media(*row) for row in rows]
@@ -0,0 +1,36 @@
+import time
+
+
+COUNTERS = ('posts_total', 'photos', 'videos', 'audios', 'store_videos')
+
+
+class Profiles:
+    def __init__(self, db):
+        self.db = db
+
+    def last(self, slug):
+        rows = self.db.fetchall('''
+            SELECT posts, photos, videos, audios, store_videos FROM profiles
+            WHERE slug = ?''', (slug,))
+        return dict(zip(COUNTERS, rows[0])) if rows else None
+
+    def record(self, slug, counters):
+        self.db.execute('''
+            INSERT OR REPLACE INTO profiles(slug, posts, photos, videos, audios, store_videos, synced)
+            VALUES(?,?,?,?,?,?,?)''',
+            (slug, *(counters.get(key, 0) for key in COUNTERS), int(time.time())))
+
+    def completed(self, slug):
+        rows = self.db.fetchall(
+            'SELECT listing FROM listings WHERE slug = ?', (slug,))
+        return {listing for (listing,) in rows}
+
+    def complete(self, slug, listings):
+        for listing in listings:
+            self.db.execute('''
+                INSERT OR REPLACE INTO listings(slug, listing, completed)
+                VALUES(?,?,?)''', (slug, listing, int(time.time())))
+
+    def new_since(self, slug, counters):
+        last = self.last(slug) or {}
+        return {key: max(counters.get(key, 0) - last.get(key, 0), 0) for key in COUNTERS}
@@ -0,0 +1,144 @@
+import os
+import time
+import asyncio
+import threading
+from functools import partial
+from urllib.parse import urlsplit
+
+from database.content import new_hasher, hash_file
+from database.dedup import part_path
+from downloads.resume import stored_etag, store_etag, discard, complete_size
+from downloads.writer import Writer, content_length
+from logs.metrics import Metrics
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+MIN_CHUNK_SIZE = 64 * 1024
+
+
+class AsyncEngine:
+    def __init__(self, headers, config, scheduler, resume=False, use_original_dates=False):
+        self.headers = headers
+        self.scheduler = scheduler
+        self.resume = resume
+        self.use_original_dates = use_original_dates
+        self.concurrency = config['concurrency']
+        self.connections_per_host = config['connections_per_host']
+        self.max_chunk_size = config['max_chunk_size']
+        self.timeout = config['timeout']
+        self.loop = None
+        self.thread = None
+        self.session = None
+        self.semaphore = None
+
+    @staticmethod
+    def available():
+        return aiohttp is not None
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self.loop).result()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(
+            self.session.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.loop = self.thread = self.session = self.semaphore = None
+
+    def submit(self, group, locate, finish, slug=''):
+        return asyncio.run_coroutine_threadsafe(
+            self._download(group, locate, finish, slug), self.loop)
+
+    async def _open(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency, limit_per_host=self.connections_per_host)
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=self.timeout)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.session = aiohttp.ClientSession(
+            headers=self.headers, connector=connector, timeout=timeout)
+
+    async def _download(self, group, locate, finish, slug):
+        Metrics.scope(slug)
+        url = group[0]
+        file_location = await self._blocking(locate, url)
+        path = part_path(file_location, url) if self.resume else file_location
+        offset = os.path.getsize(path) if self.resume and os.path.exists(path) else 0
+        stored = stored_etag(path) if offset else None
+        if offset and not stored:
+            discard(path)
+            offset = 0
+        headers = {'Range': f'bytes={offset}-', 'If-Range': stored} if offset else None
+        mtime = group[1] if self.use_original_dates else None
+        hasher = new_hasher()
+        async with self.semaphore:
+            async with await self._get(url, headers) as r:
+                etag = r.headers.get('ETag')
+                if r.status == 416 and offset:
+                    if complete_size(r.headers) != offset:
+                        discard(path, f'{path}.etag')
+                        raise aiohttp.ClientResponseError(
+                            r.request_info, r.history, status=r.status,
+                            message="Partial download doesn't match")
+                    etag = stored
+                    await self._blocking(hash_file, path, hasher)
+                    if mtime is not None:
+                        os.utime(path, (mtime, mtime))
+                else:
+                    r.raise_for_status()
+                    mode = 'ab' if r.status == 206 else 'wb'
+                    if mode == 'ab':
+                        await self._blocking(hash_file, path, hasher)
+                    elif self.resume:
+                        store_etag(path, etag)
+                    size = content_length(r.headers)
+                    if size and mode == 'ab':
+                        size += offset
+                    writer = Writer(path, mode, size, hasher, mtime, self.resume)
+                    await self._write(r, writer)
+        if self.resume:
+            os.replace(path, file_location)
+            discard(f'{path}.etag')
+        await self._blocking(finish, group, file_location, hasher.hexdigest(),
+                             etag, dated=mtime is not None)
+        return file_location
+
+    async def _blocking(self, func, *args, **kwargs):
+        return await self.loop.run_in_executor(None, partial(func, *args, **kwargs))
+
+    async def _get(self, url, headers):
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                r = await self.session.get(url, headers=headers)
+            except aiohttp.ClientError:
+                Metrics.http(urlsplit(url).netloc, 'error', 0,
+                             time.perf_counter() - start, retries=attempt)
+                raise
+            if not self.scheduler.should_retry(r.status, attempt):
+                elapsed = time.perf_counter() - start
+                Metrics.http(urlsplit(url).netloc, r.status, 0, elapsed, elapsed, attempt)
+                return r
+            delay = self.scheduler.backoff(
+                attempt, r.headers.get('Retry-After'))
+            r.release()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _write(self, r, writer):
+        chunk_size = MIN_CHUNK_SIZE
+        with writer:
+            while chunk := await r.content.read(chunk_size):
+                await self._blocking(writer.write, chunk)
+                if delay := self.scheduler.bandwidth.reserve(len(chunk)):
+                    await asyncio.sleep(delay)
+                if len(chunk) == chunk_size and chunk_size < self.max_chunk_size:
+                    chunk_size *= 2
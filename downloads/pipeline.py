@@ -0,0 +1,155 @@
+import os
+import time
+import heapq
+import threading
+import collections
+import concurrent.futures
+from functools import partial
+
+from logs.metrics import Metrics
+
+
+class Lane:
+    def __init__(self, workers, queue_size):
+        self.heap = []
+        self.free = workers
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+
+
+class Pipeline:
+    def __init__(self, workers, factory, scheduler, prioritizer, engine=None, desc='Downloading'):
+        if engine:
+            workers = engine.concurrency
+        self.factory = factory
+        self.scheduler = scheduler
+        self.prioritizer = prioritizer
+        self.engine = engine
+        self.desc = desc
+        self.downloaders = {}
+        self.executor = None
+        self.outstanding = 0
+        self.idle = threading.Condition()
+        self.retry = []
+        self.failed = []
+        self.lock = threading.Lock()
+        self.bar = None
+        self.workers = workers
+        large = max(1, min(prioritizer.large_workers, workers - 1))
+        self.lanes = {
+            'small': Lane(max(workers - large, 1), prioritizer.queue_size),
+            'large': Lane(large, prioritizer.queue_size),
+        }
+        self.stats = collections.defaultdict(collections.Counter)
+
+    def __enter__(self):
+        from tqdm import tqdm
+        if self.engine:
+            self.engine.start()
+        else:
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.workers)
+        self.bar = tqdm(desc=self.desc, total=0, colour='red')
+        return self
+
+    def __exit__(self, *exc):
+        self.wait()
+        attempt = 0
+        while self.retry and attempt < self.scheduler.max_retries:
+            time.sleep(self.scheduler.backoff(attempt))
+            retry, self.retry = self.retry, []
+            for slug, group, _ in retry:
+                self.stats[slug]['retried'] += 1
+                self.enqueue(group, slug)
+            self.wait()
+            attempt += 1
+        for slug, group, exception in self.retry:
+            self.get_downloader(slug, group[2], group[3]).fail(group)
+            self.stats[slug]['failed'] += 1
+            self.failed.append((slug, group, exception))
+            self.bar.update(1)
+        if self.engine:
+            self.engine.stop()
+        else:
+            self.executor.shutdown(wait=True)
+        self.bar.close()
+
+    def wait(self):
+        with self.idle:
+            self.idle.wait_for(lambda: not self.outstanding)
+
+    def get_downloader(self, slug, type_, media_type):
+        key = (slug, type_, media_type)
+        with self.lock:
+            if key not in self.downloaders:
+                downloader = self.factory(slug, type_, media_type)
+                downloader.prepare()
+                self.downloaders[key] = downloader
+            return self.downloaders[key]
+
+    def submit(self, group, slug):
+        with self.lock:
+            self.stats[slug]['queued'] += 1
+            self.bar.total += 1
+            self.bar.refresh()
+        self.enqueue(group, slug)
+
+    def enqueue(self, group, slug):
+        downloader = self.get_downloader(slug, group[2], group[3])
+        lane = self.prioritizer.lane(group)
+        self.lanes[lane].slots.acquire()
+        downloader.start(group)
+        with self.idle:
+            self.outstanding += 1
+        with self.lock:
+            heapq.heappush(self.lanes[lane].heap,
+                           (self.prioritizer.key(group), slug, group, lane))
+        self.dispatch()
+
+    def dispatch(self):
+        ready = []
+        with self.lock:
+            for lane in self.lanes.values():
+                while lane.free and lane.heap:
+                    lane.free -= 1
+                    ready.append(heapq.heappop(lane.heap)[1:])
+        for slug, group, lane in ready:
+            self.launch(group, slug, lane)
+
+    def launch(self, group, slug, lane):
+        downloader = self.get_downloader(slug, group[2], group[3])
+        started = time.perf_counter()
+        if self.engine:
+            future = self.engine.submit(
+                group, downloader.get_location, downloader.finish, slug)
+        else:
+            future = self.executor.submit(
+                self.run, slug, downloader.download, group)
+        future.add_done_callback(partial(
+            self._done, slug=slug, group=group, lane=lane, started=started))
+
+    @staticmethod
+    def run(slug, download, group):
+        Metrics.scope(slug)
+        return download(group)
+
+    def _done(self, future, slug, group, lane, started):
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.lanes[lane].free += 1
+            if exception := future.exception():
+                self.retry.append((slug, group, exception))
+            else:
+                self.stats[slug]['downloaded'] += 1
+                self.bar.update(1)
+        category = f'{group[2]}/{group[3]}'
+        if exception:
+            Metrics.download(category, 'error', 0, elapsed, slug)
+        elif file_location := future.result():
+            size = os.path.getsize(file_location)
+            self.prioritizer.learn(group, size)
+            Metrics.download(category, 'ok', size, elapsed, slug)
+        self.lanes[lane].slots.release()
+        self.dispatch()
+        with self.idle:
+            self.outstanding -= 1
+            self.idle.notify_all()
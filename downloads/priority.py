@@ -0,0 +1,66 @@
+import itertools
+import threading
+import collections
+
+
+class Prioritizer:
+    def __init__(self, session, config):
+        self.session = session
+        self.order = config['priority']
+        self.media_priority = config['media_priority']
+        self.large_file_size = config['large_file_size']
+        self.large_workers = config['large_workers']
+        self.queue_size = config['queue_size']
+        self.probe_sizes = config['probe_sizes']
+        self.sizes = collections.defaultdict(lambda: [0, 0])
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def key(self, group):
+        media_type = group[3]
+        if media_type in self.media_priority:
+            rank = self.media_priority.index(media_type)
+        else:
+            rank = len(self.media_priority)
+        if self.order == 'newest':
+            age = -group[1]
+        elif self.order == 'oldest':
+            age = group[1]
+        else:
+            age = 0
+        return rank, age, next(self.counter)
+
+    def lane(self, group):
+        return 'large' if self.expected_size(group) >= self.large_file_size else 'small'
+
+    def expected_size(self, group):
+        if self.probe_sizes and group[3] == 'Video':
+            if (size := self.probe(group[0])) is not None:
+                return size
+        with self.lock:
+            total, count = self.sizes[(group[2], group[3])]
+        if count:
+            return total / count
+        return self.large_file_size if group[3] == 'Video' else 0
+
+    def might_reach(self, group, size):
+        if group[3] != 'Video':
+            return False
+        with self.lock:
+            total, count = self.sizes[(group[2], group[3])]
+        return not count or total / count * 2 >= size
+
+    def probe(self, url):
+        try:
+            r = self.session.head(url, allow_redirects=True)
+        except Exception:
+            return None
+        if r.ok and 'Content-Length' in r.headers:
+            return int(r.headers['Content-Length'])
+        return None
+
+    def learn(self, group, size):
+        with self.lock:
+            stats = self.sizes[(group[2], group[3])]
+            stats[0] += size
+            stats[1] += 1
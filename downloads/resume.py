@@ -0,0 +1,130 @@
+import os
+import concurrent.futures
+import contextvars
+
+import requests
+
+from database.content import new_hasher, hash_file
+from database.dedup import part_path
+from downloads.writer import Writer, content_length
+
+
+def stored_etag(part):
+    try:
+        with open(f'{part}.etag') as f:
+            return f.read() or None
+    except FileNotFoundError:
+        return None
+
+
+def store_etag(part, etag):
+    if etag:
+        with open(f'{part}.etag', 'w') as f:
+            f.write(etag)
+    else:
+        discard(f'{part}.etag')
+
+
+def discard(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def complete_size(headers):
+    unit, _, total = headers.get('Content-Range', '').partition(' */')
+    return int(total) if unit == 'bytes' and total.isdigit() else None
+
+
+class Resumable:
+    def __init__(self, session, config):
+        self.session = session
+        self.segments = config['segments']
+        self.segment_size = config['segment_size']
+
+    def fetch(self, url, file_location, mtime=None, split=True):
+        part = part_path(file_location, url)
+        hasher = new_hasher()
+        size, etag = None, None
+        if self.segments > 1 and (split or os.path.exists(f'{part}0')):
+            size, etag = self.probe(url)
+        if size and size >= self.segment_size * 2:
+            self.fetch_segments(url, part, size, etag, hasher, mtime)
+        else:
+            etag = self.fetch_range(url, part, hasher=hasher, mtime=mtime)
+        os.replace(part, file_location)
+        discard(f'{part}.etag')
+        return hasher.hexdigest(), etag
+
+    def probe(self, url):
+        r = self.session.head(url, allow_redirects=True)
+        if r.ok and r.headers.get('Accept-Ranges') == 'bytes':
+            return int(r.headers.get('Content-Length', 0)) or None, r.headers.get('ETag')
+        return None, None
+
+    def fetch_range(self, url, path, start=0, end=None, hasher=None, mtime=None, etag=None):
+        offset = os.path.getsize(path) if os.path.exists(path) else 0
+        if end is None:
+            etag = stored_etag(path)
+            if offset and not etag:
+                discard(path)
+                offset = 0
+        if end is not None and start + offset > end:
+            return None
+        headers = {}
+        if start + offset or end is not None:
+            headers['Range'] = f"bytes={start + offset}-{'' if end is None else end}"
+        if offset and etag:
+            headers['If-Range'] = etag
+        with self.session.get(url, headers=headers, stream=True) as r:
+            if r.status_code == 416 and offset:
+                if end is not None or complete_size(r.headers) != offset:
+                    discard(path, f'{path}.etag')
+                    raise requests.HTTPError(
+                        f"Partial download doesn't match url: {url}", response=r)
+                if hasher:
+                    hash_file(path, hasher)
+                if mtime is not None:
+                    os.utime(path, (mtime, mtime))
+                return etag
+            r.raise_for_status()
+            if r.status_code != 206 and (start or end is not None):
+                raise requests.HTTPError(
+                    f"Range request ignored for url: {url}", response=r)
+            mode = 'ab' if r.status_code == 206 else 'wb'
+            if hasher and mode == 'ab':
+                hash_file(path, hasher)
+            if end is None and mode == 'wb':
+                store_etag(path, r.headers.get('ETag'))
+            r.raw.decode_content = True
+            size = content_length(r.headers)
+            if size and mode == 'ab':
+                size += offset
+            with Writer(path, mode, size, hasher, mtime, resumable=True) as writer:
+                writer.copy(r.raw, self.session.scheduler.throttle)
+            return r.headers.get('ETag')
+
+    def fetch_segments(self, url, part, size, etag, hasher, mtime=None):
+        count = min(self.segments, size // self.segment_size)
+        step = -(-size // count)
+        ranges = [(f'{part}{i}', i * step, min((i + 1) * step, size) - 1)
+                  for i in range(count)]
+        if not etag or stored_etag(part) != etag:
+            discard(*(f'{part}{i}' for i in range(self.segments)))
+            store_etag(part, etag)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=count) as executor:
+            futures = [executor.submit(contextvars.copy_context().run,
+                                       self.fetch_range, url, *segment, etag=etag)
+                       for segment in ranges]
+            for future in futures:
+                future.result()
+        for path, start, end in ranges:
+            if os.path.getsize(path) != end - start + 1:
+                discard(path)
+                raise requests.HTTPError(
+                    f"Incomplete segment {path} for url: {url}")
+        with Writer(part, size=size, hasher=hasher, mtime=mtime) as writer:
+            for path, _, _ in ranges:
+                with open(path, 'rb', buffering=0) as segment:
+                    writer.copy(segment)
+        discard(*(path for path, _, _ in ranges))
@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import ctypes
+import threading
+
+from logs.metrics import Metrics
+
+FALLOC_FL_KEEP_SIZE = 1
+
+_local = threading.local()
+
+
+def _load_fallocate():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fallocate = getattr(libc, 'fallocate64', None) or libc.fallocate
+    except (OSError, AttributeError):
+        return None
+    fallocate.argtypes = [ctypes.c_int, ctypes.c_int,
+                          ctypes.c_longlong, ctypes.c_longlong]
+    fallocate.restype = ctypes.c_int
+    return fallocate
+
+
+_fallocate = _load_fallocate()
+
+
+class IncompleteWrite(IOError):
+    pass
+
+
+def content_length(headers):
+    if headers.get('Content-Encoding', 'identity') != 'identity':
+        return None
+    return int(headers.get('Content-Length', 0)) or None
+
+
+def get_buffer(size):
+    if getattr(_local, 'size', None) != size:
+        _local.buffer = memoryview(bytearray(size))
+        _local.size = size
+    return _local.buffer
+
+
+class Writer:
+    write_size = 1024 * 1024
+    preallocate = True
+
+    def __init__(self, path, mode='wb', size=None, hasher=None, mtime=None, resumable=False):
+        self.path = path
+        self.mode = mode
+        self.size = size
+        self.hasher = hasher
+        self.mtime = mtime
+        self.resumable = resumable
+        self.file = None
+        self.reserved = None
+        self.written = 0
+        self.elapsed = 0
+
+    def __enter__(self):
+        self.file = open(self.path, self.mode, buffering=0)
+        if self.preallocate and self.size:
+            self.reserve(self.file.tell())
+        return self
+
+    def reserve(self, offset):
+        length = self.size - offset
+        if length <= 0:
+            return
+        fd = self.file.fileno()
+        if _fallocate and _fallocate(fd, FALLOC_FL_KEEP_SIZE, offset, length) == 0:
+            self.reserved = self.size
+        elif not self.resumable and self.mode == 'wb' and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd, offset, length)
+            except OSError:
+                return
+            self.reserved = self.size
+
+    def write(self, data):
+        view = memoryview(data)
+        start = time.perf_counter()
+        while view:
+            view = view[self.file.write(view):]
+        self.elapsed += time.perf_counter() - start
+        self.written += len(data)
+        if self.hasher:
+            self.hasher.update(data)
+
+    def copy(self, source, throttle=None):
+        buffer = get_buffer(self.write_size)
+        while n := source.readinto(buffer):
+            self.write(buffer[:n])
+            if throttle:
+                throttle(n)
+
+    def __exit__(self, exc_type, *exc):
+        error = None
+        try:
+            end = self.file.tell()
+            if self.reserved is not None and end < self.reserved:
+                self.file.truncate()
+            if exc_type is None and self.size and end != self.size:
+                error = IncompleteWrite(
+                    f"Expected {self.size} bytes but got {end} for {self.path}")
+            elif exc_type is None and self.mtime is not None and os.utime in os.supports_fd:
+                os.utime(self.file.fileno(), (self.mtime, self.mtime))
+                self.mtime = None
+        finally:
+            self.file.close()
+        Metrics.disk(self.written, self.elapsed)
+        if error:
+            raise error
+        if self.mtime is not None and exc_type is None:
+            os.utime(self.path, (self.mtime, self.mtime))
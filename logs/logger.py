@@ -3,7 +3,7 @@ import sys
 import logging
 import platform
 
-from blessed import Terminal
+from logs.terminal import get_terminal
 
 _status_error = '''
 There was an error connecting to LoyalFans's servers. This could either be because their servers are down or because your 'authorization' cookie has expired.'''
@@ -28,7 +28,7 @@ class Logger:
     KEY_ERROR = _key_error
 
     def __init__(self, debug):
-        self.term = Terminal()
+        self.term = get_terminal()
         self.logger = logging.getLogger(__name__)
         if debug:
             self.logger.setLevel(logging.DEBUG)
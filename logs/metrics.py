@@ -0,0 +1,191 @@
+import os
+import csv
+import json
+import time
+import bisect
+import threading
+import contextvars
+import collections
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                    0.5, 1, 2.5, 5, 10, 30, 60, 300)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(11))
+
+creator = contextvars.ContextVar('creator', default='')
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'max': round(self.max, 6),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': dict(zip(map(str, self.buckets + ('+Inf',)), self.counts)),
+        }
+
+
+class Series:
+    def __init__(self):
+        self.statuses = collections.Counter()
+        self.retries = 0
+        self.errors = 0
+        self.bytes = 0
+        self.seconds = 0
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.ttfb = Histogram(DURATION_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+
+    def observe(self, status, nbytes, duration, ttfb=None, retries=0):
+        self.statuses[str(status)] += 1
+        if isinstance(status, int) and status >= 400 or status == 'error':
+            self.errors += 1
+        self.retries += retries
+        self.bytes += nbytes
+        self.seconds += duration
+        self.duration.observe(duration)
+        self.size.observe(nbytes)
+        if ttfb is not None:
+            self.ttfb.observe(ttfb)
+
+    def to_dict(self):
+        return {
+            'count': self.duration.count,
+            'errors': self.errors,
+            'retries': self.retries,
+            'bytes': self.bytes,
+            'seconds': round(self.seconds, 6),
+            'mb_per_s': round(self.bytes / self.seconds / 1e6, 3) if self.seconds else 0,
+            'statuses': dict(self.statuses),
+            'duration': self.duration.to_dict(),
+            'ttfb': self.ttfb.to_dict(),
+            'size': self.size.to_dict(),
+        }
+
+
+class Metrics:
+    enabled = True
+    _series = collections.defaultdict(Series)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def scope(slug):
+        creator.set(slug)
+
+    @classmethod
+    def observe(cls, kind, name, status, nbytes=0, duration=0, ttfb=None, retries=0, slug=None):
+        if not cls.enabled:
+            return
+        if slug is None:
+            slug = creator.get()
+        with cls._lock:
+            cls._series[(slug, kind, name)].observe(
+                status, nbytes, duration, ttfb, retries)
+
+    @classmethod
+    def http(cls, endpoint, status, nbytes, duration, ttfb=None, retries=0):
+        cls.observe('http', endpoint, status, nbytes, duration, ttfb, retries)
+
+    @classmethod
+    def download(cls, category, status, nbytes, duration, slug=None):
+        cls.observe('download', category, status, nbytes, duration, slug=slug)
+
+    @classmethod
+    def disk(cls, nbytes, duration):
+        cls.observe('disk', 'write', 'ok', nbytes, duration)
+
+    @classmethod
+    def snapshot(cls, slug=None):
+        with cls._lock:
+            return {key: series.to_dict() for key, series in cls._series.items()
+                    if slug is None or key[0] == slug}
+
+    @classmethod
+    def report(cls, directory, slug, formats):
+        if not cls.enabled:
+            return []
+        os.makedirs(directory, exist_ok=True)
+        series = cls.snapshot(slug)
+        stem = os.path.join(
+            directory, f"{slug}-{time.strftime('%Y%m%d-%H%M%S')}")
+        written = []
+        if 'json' in formats:
+            report = collections.defaultdict(dict)
+            for (_, kind, name), values in sorted(series.items()):
+                report[kind][name] = values
+            with open(f'{stem}.json', 'w') as f:
+                json.dump({'creator': slug, 'created': int(time.time()),
+                           **report}, f, indent=4)
+            written.append(f'{stem}.json')
+        if 'csv' in formats:
+            with open(f'{stem}.csv', 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['kind', 'name', 'count', 'errors', 'retries',
+                                 'bytes', 'seconds', 'mb_per_s', 'ttfb_p50', 'ttfb_p95',
+                                 'duration_p50', 'duration_p95', 'duration_max'])
+                for (_, kind, name), values in sorted(series.items()):
+                    writer.writerow([
+                        kind, name, values['count'], values['errors'],
+                        values['retries'], values['bytes'], values['seconds'],
+                        values['mb_per_s'], values['ttfb']['p50'], values['ttfb']['p95'],
+                        values['duration']['p50'], values['duration']['p95'],
+                        values['duration']['max']])
+            written.append(f'{stem}.csv')
+        return written
+
+    @classmethod
+    def prometheus(cls, path):
+        if not cls.enabled:
+            return
+        families = collections.defaultdict(list)
+        for (slug, kind, name), values in sorted(cls.snapshot().items()):
+            labels = f'creator="{slug}",kind="{kind}",name="{name}"'
+            for status, count in values['statuses'].items():
+                families[('requests_total', 'counter')].append(
+                    f'{{{labels},status="{status}"}} {count}')
+            families[('retries_total', 'counter')].append(
+                f'{{{labels}}} {values["retries"]}')
+            families[('bytes_total', 'counter')].append(
+                f'{{{labels}}} {values["bytes"]}')
+            for metric in ('duration', 'ttfb'):
+                histogram = values[metric]
+                family = families[(f'{metric}_seconds', 'histogram')]
+                seen = 0
+                for bound, count in histogram['buckets'].items():
+                    seen += count
+                    family.append(f'_bucket{{{labels},le="{bound}"}} {seen}')
+                family.append(f'_sum{{{labels}}} {histogram["sum"]}')
+                family.append(f'_count{{{labels}}} {histogram["count"]}')
+        lines = []
+        for (metric, type_), samples in families.items():
+            lines.append(f'# TYPE loyalfans_{metric} {type_}')
+            lines.extend(f'loyalfans_{metric}{sample}' for sample in samples)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(f'{path}.tmp', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(f'{path}.tmp', path)
@@ -0,0 +1,25 @@
+class Silent:
+    def start(self, *args, **kwargs):
+        return self
+
+    def stop(self):
+        return self
+
+    def succeed(self, *args, **kwargs):
+        return self
+
+    def fail(self, *args, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def get_spinner(text='', enabled=True):
+    if not enabled:
+        return Silent()
+    from halo import Halo
+    return Halo(text=text, color='red')
@@ -0,0 +1,22 @@
+import sys
+import threading
+
+_terminal = None
+_lock = threading.Lock()
+
+
+class PlainTerminal:
+    def __getattr__(self, name):
+        return str
+
+
+def get_terminal():
+    global _terminal
+    with _lock:
+        if _terminal is None:
+            if sys.stdout.isatty():
+                from blessed import Terminal
+                _terminal = Terminal()
+            else:
+                _terminal = PlainTerminal()
+        return _terminal
@@ -1,62 +1,47 @@
 import os
 import sys
-import json
+import argparse
+import collections
 import concurrent.futures
 import time
-import datetime
-import sqlite3
-from contextlib import closing
 import platform
+from functools import partial
 
 import requests
-from tqdm import tqdm
-from blessed import Terminal
-from halo import Halo
-from dateutil.parser import parse
-from win32_setctime import setctime
 
-from logs.logger import Logger
+from context.context import Context
+from logs.metrics import Metrics
+from logs.spinner import get_spinner
+from database.dedup import Dedup, media_key
+from database.content import new_hasher
+from media.extract import extract_post, extract_message, extract_store_video
+from media.verify import OK, REJECTED, Verifier, media_type_of
+from network.session import Session
+from downloads.pipeline import Pipeline
+from downloads.writer import Writer, content_length
+
+
+class ScrapeError(Exception):
+    pass
 
 
 class User:
     def __init__(self):
-        with open(os.path.join(sys.path[0], 'config.json')) as f:
-            config = json.load(f)['config']
-        self.headers = config['headers']
-        if settings := config['settings']:
-            self.destination_path = settings['destination_path']
-            if not self.destination_path:
-                self.destination_path = os.getcwd()
-            self.separate_file_types = settings['separate_file_types']
-            self.download_preview_videos = settings['download_preview_videos']
-            self.avoid_duplicates = settings['avoid_duplicates']
-            self.use_original_dates = settings['use_original_dates']
-            self.timezone = settings['timezone']
-            self.debug = settings['debug']
-        if urls := config['urls']:
-            self.user_url = urls['user_url']
-            self.follow_url = urls['follow_url']
-            self.profile_url = urls['profile_url']
-            self.timeline_url = urls['timeline_url']
-            self.messages_url = urls['messages_url']
-            self.video_store_url = urls['video_store_url']
-        if self.avoid_duplicates:
-            self.db_dir = os.path.join(sys.path[0], 'db')
-            if not os.path.isdir(self.db_dir):
-                os.mkdir(self.db_dir)
-            self.conn = sqlite3.connect(os.path.join(self.db_dir, 'models.db'))
-        self.log = Logger(self.debug)
-        self.term = Terminal()
+        self.context = Context.get()
+
+    def __getattr__(self, name):
+        if name == 'context':
+            raise AttributeError(name)
+        return getattr(self.context, name)
 
     def scrape_user(self):
-        with requests.Session() as s:
-            r = s.get(self.user_url, headers=self.headers)
+        r = self.session.get(self.user_url, cache=True, endpoint='user')
         if r.ok:
             self.log.debug(self.term.lime(f"{r.status_code} STATUS CODE"))
         else:
             self.log.info(self.term.red(f"{r.status_code} STATUS CODE"))
             self.log.info(self.term.red(self.log.STATUS_ERROR))
-            sys.exit(0)
+            r.raise_for_status()
         try:
             following_count = r.json()['following']
         except KeyError:
@@ -67,14 +52,14 @@ class User:
         payload = {
             'limit': count,
         }
-        with requests.Session() as s:
-            r = s.post(self.follow_url, headers=self.headers, params=payload)
+        r = self.session.post(
+            self.follow_url, params=payload, cache=True, endpoint='follow')
         if r.ok:
             self.log.debug(self.term.lime(f"{r.status_code} STATUS CODE"))
         else:
             self.log.info(self.term.red(f"{r.status_code} STATUS CODE"))
             self.log.info(self.term.red(self.log.STATUS_ERROR))
-            sys.exit(0)
+            r.raise_for_status()
         creators = r.json()['followed']
         creators_info_list = [(creator['name'].strip(), creator['slug'])
                               for creator in creators]
@@ -82,23 +67,66 @@ class User:
         creators_list = list(enumerate(creators_info_list, 1))
         return creators_list
 
+    def scrape_counters(self, slug):
+        try:
+            r = self.session.get(self.profile_url.format(
+                slug), cache=True, endpoint='profile')
+        except requests.RequestException as e:
+            self.log.debug(self.term.red(f"Unable to fetch {slug}'s profile: {e!r}"))
+            return None
+        if not r.ok:
+            self.log.debug(self.term.red(f"{r.status_code} STATUS CODE for {slug}"))
+            return None
+        try:
+            return r.json()['data']['counters']
+        except (KeyError, ValueError):
+            self.log.debug(self.term.red(f"No counters in {slug}'s profile"))
+            return None
+
+    def prefetch_profiles(self, slugs):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.prefetch_workers) as executor:
+            counters = dict(zip(slugs, executor.map(self.scrape_counters, slugs)))
+        return {slug: (c, self.profiles.new_since(slug, c) if self.profiles else None)
+                for slug, c in counters.items() if c}
+
+    def report_failures(self, failed):
+        for _, group, exception in failed:
+            self.log.info(self.term.red(f"Unable to download {group[0]}"))
+            self.log.debug(repr(exception))
+
+    def wait_for_verification(self):
+        if self.verifier:
+            self.verifier.wait()
+
+    def write_report(self, slug):
+        for path in Metrics.report(self.reports_dir, slug, self.report_formats):
+            self.log.debug(self.term.lime(f"Report written to {path}"))
+        if self.prometheus:
+            Metrics.prometheus(os.path.join(self.reports_dir, 'loyalfans.prom'))
+
 
 class Model(User):
-    def __init__(self, array):
+    def __init__(self, array, interactive=True, prefetched=None):
         super().__init__()
         self.creator_list = array
+        self.interactive = interactive
+        self.prefetched = prefetched or {}
+        self.counters = None
         self.name = None
         self.slug = None
         self.limit = None
-        if self.avoid_duplicates:
-            self.ids = None
+        self.sink = None
+        self.dedup = None
+        self.complete = set()
+        self.walked = set()
+        self.failed = []
 
     def menu(self):
-        header = ['NUMBER', 'NAME', 'HANDLE']
-        FORMAT = '{:<22}' * len(header)
+        header = ['NUMBER', 'NAME', 'HANDLE', 'POSTS', 'PHOTOS', 'VIDEOS', 'STORE', 'NEW']
+        FORMAT = '{:<8}{:<22}{:<22}' + '{:<9}' * 5
         self.log.info(self.term.underline(FORMAT.format(*header)))
         for c, v in self.creator_list:
-            self.log.info(FORMAT.format(c, *v))
+            self.log.info(FORMAT.format(c, *v, *self.profile_columns(v[1])))
         self.log.info(self.term.bold(
             "\nSelect a creator by entering their corresponding number\nor enter a negative number to quit the program"))
         while True:
@@ -116,17 +144,37 @@ class Model(User):
             except ValueError:
                 self.log.info(self.term.gold("Please enter a number"))
 
+    def profile_columns(self, slug):
+        if slug not in self.prefetched:
+            return ['-'] * 5
+        counters, new = self.prefetched[slug]
+        return [
+            counters['posts_total'],
+            counters['photos'],
+            counters['videos'] - counters['store_videos'],
+            counters['store_videos'],
+            '-' if new is None else f"+{new['posts_total'] + new['store_videos']}",
+        ]
+
+    def record_sync(self):
+        if self.profiles and self.counters and not Session.offline:
+            self.profiles.record(self.slug, self.counters)
+            self.profiles.complete(self.slug, self.walked)
+            self.prefetched[self.slug] = (
+                self.counters, self.profiles.new_since(self.slug, self.counters))
+
     def scrape_profile(self):
-        with requests.Session() as s:
-            r = s.get(self.profile_url.format(self.slug), headers=self.headers)
+        r = self.session.get(self.profile_url.format(
+            self.slug), cache=True, endpoint='profile')
         if r.ok:
             self.log.debug(self.term.lime(f"{r.status_code} STATUS CODE"))
         else:
             self.log.info(self.term.red(f"{r.status_code} STATUS CODE"))
             self.log.info(self.term.red(self.log.STATUS_ERROR))
-            sys.exit(0)
+            r.raise_for_status()
         profile = r.json()
         try:
+            self.counters = profile['data']['counters']
             num_posts = profile['data']['counters']['posts_total']
             num_photos = profile['data']['counters']['photos']
             num_videos = profile['data']['counters']['videos']
@@ -142,99 +190,47 @@ class Model(User):
         while num_posts % 4 != 0:
             num_posts += 1
         self.limit = num_posts
+        self.walked = set()
+        self.failed = []
         if self.avoid_duplicates:
-            with closing(self.conn.cursor()) as c:
-                c.execute(f'''
-                    SELECT name FROM sqlite_master
-                    WHERE type='table' AND name='{self.slug}'
-                ''')
-                if not c.fetchone():
-                    c.execute(
-                        f'''CREATE TABLE {self.slug}(
-                            ID INTEGER PRIMARY KEY,
-                            URL TEXT,
-                            TIMESTAMP INTEGER,
-                            TYPE TEXT,
-                            MEDIA_TYPE TEXT,
-                            DATE TEXT,
-                            FILE_ID TEXT
-                    )''')
-                    self.conn.commit()
-                c.execute(f'''SELECT file_id FROM {self.slug}''')
-                file_ids = c.fetchall()
-                self.ids = [i[0] for i in file_ids]
+            self.dedup = Dedup(self.db, self.slug, self.max_attempts)
+            self.complete = self.profiles.completed(self.slug)
         return num_store_videos
 
-    def scrape_timeline(self):
-        with Halo(text=f"Scraping {self.term.bold(self.name)}'s photos and videos...", color='red') as spinner:
-            with requests.Session() as s:
-                r = s.get(self.timeline_url.format(
-                    self.slug, self.limit), headers=self.headers)
+    def paginate_timeline(self):
+        page = 0
+        while page * self.page_size < self.limit:
+            r = self.session.get(self.timeline_url.format(
+                self.slug, self.page_size, page), cache=True, endpoint='timeline')
             if r.ok:
-                spinner.succeed()
+                self.log.debug(self.term.lime(f"{r.status_code} STATUS CODE"))
             else:
-                spinner.fail()
-                self.log.info(self.term.red(f"{r.status_code} STATUS CODE"))
-                self.log.info(self.term.red(self.log.STATUS_ERROR))
-                sys.exit(0)
-        timeline = r.json()
-        posts = timeline['timeline']
-        self.log.info(f"\t· Found {self.term.bold(str(len(posts)))} posts")
+                raise requests.HTTPError(
+                    f"{r.status_code} STATUS CODE for url: {r.url}", response=r)
+            posts = r.json()['timeline']
+            yield posts
+            if len(posts) < self.page_size:
+                return
+            page += 1
+
+    def scrape_timeline(self):
+        num_posts = 0
         images, videos, audios = [], [], []
-        for post in posts:
-            if self.avoid_duplicates and post['uid'] in self.ids:
-                pass
-            else:
-                if post['photo']:
-                    if 'photos' in (has_photos := post['photos']):
-                        type_, media_type = 'Timeline', 'Image'
-                        uid = post['uid']
-                        date = post['created_at']['date']
-                        ts = self.get_timestamp(date)
-                        photos = has_photos['photos']
-                        for photo in photos:
-                            image_url = photo['images']['original']
-                            image_url = image_url.replace('\\', '')
-                            images.append((image_url, ts, type_,
-                                           media_type, date, uid))
-                    else:
-                        pass
-                else:
-                    pass
-                if post['video']:
-                    if 'video_url' in (video_object := post['video_object']):
-                        type_, media_type = 'Timeline', 'Video'
-                        uid = post['uid']
-                        date = post['created_at']['date']
-                        ts = self.get_timestamp(date)
-                        video_url = video_object['video_url']
-                        video_url = video_url.replace('\\', '')
-                        videos.append((video_url, ts, type_,
-                                       media_type, date, uid))
-                    elif 'video_trailer' in video_object:
-                        if self.download_preview_videos:
-                            type_, media_type = 'Timeline', 'Video'
-                            uid = post['uid']
-                            date = post['created_at']['date']
-                            ts = self.get_timestamp(date)
-                            video_url = video_object['video_trailer']
-                            video_url.replace('\\', '')
-                            videos.append((video_url, ts, type_,
-                                           media_type, date, uid))
-                        else:
-                            pass
-                    else:
-                        pass
-                if post['audio']:
-                    if 'audio_url' in (audio_object := post['audio_object']):
-                        type_, media_type = 'Timeline', 'Audio'
-                        uid = post['uid']
-                        date = post['created_at']['date']
-                        ts = self.get_timestamp(date)
-                        audio_url = audio_object['audio_url']
-                        audio_url = audio_url.replace('\\', '')
-                        audios.append((audio_url, ts, type_,
-                                       media_type, date, uid))
+        arrays = {'Image': images, 'Video': videos, 'Audio': audios}
+        with get_spinner(f"Scraping {self.term.bold(self.name)}'s photos and videos...", self.interactive) as spinner:
+            for posts in self.walk('timeline', self.paginate_timeline(), spinner):
+                num_posts += len(posts)
+                for post in posts:
+                    for media in extract_post(post, self.download_preview_videos):
+                        self.add(arrays[media.media_type], media)
+                uids = [post['uid'] for post in posts
+                        if post['photo'] or post['video'] or post['audio']]
+                if self.stop_early('timeline', uids):
+                    self.log.debug("Reached previously downloaded posts")
+                    break
+            if 'timeline' not in self.failed:
+                spinner.succeed()
+        self.log.info(f"\t· Found {self.term.bold(str(num_posts))} posts")
         self.log.info(
             f"\t  — Found {self.term.bold(str(len(images)))} new photos")
         self.log.info(
@@ -243,73 +239,71 @@ class Model(User):
             f"\t  — Found {self.term.bold(str(len(audios)))} new audios")
         return images, videos, audios
 
-    def scrape_messages(self, url, tz, array=[]):
-        if not array:
-            spinner = Halo(
-                text=f"Scraping your messages with {self.term.bold(self.name)}...", color='red')
-            spinner.start()
-        with requests.Session() as s:
-            r = s.get(url, headers=self.headers)
-        if r.status_code == 200:
-            self.log.debug(self.term.lime(f"{r.status_code} STATUS CODE"))
-        else:
-            spinner.fail()
-            self.log.info(self.term.red(f"{r.status_code} STATUS CODE"))
-            self.log.info(self.term.red(self.log.STATUS_ERROR))
-            sys.exit(0)
-        messages_api = r.json()
-        try:
-            list_messages = messages_api['messages']
-            list_messages += array
-            mid = "&mid=" + messages_api['mid_token']
-            new_messages_url = self.messages_url.format(self.slug, tz, mid)
-            messages = self.scrape_messages(
-                new_messages_url, tz, list_messages)
-        except KeyError:
-            if array:
-                return list_messages
+    def paginate_messages(self, url, tz):
+        while True:
+            r = self.session.get(url, cache=True, endpoint='messages')
+            if r.status_code == 200:
+                self.log.debug(self.term.lime(f"{r.status_code} STATUS CODE"))
             else:
-                messages = list_messages
-        if array:
-            return messages
-        spinner.succeed()
-        self.log.info(
-            f"\t· Found {self.term.bold(str(len(messages)))} messages")
+                raise requests.HTTPError(
+                    f"{r.status_code} STATUS CODE for url: {r.url}", response=r)
+            messages_api = r.json()
+            yield messages_api['messages']
+            if 'mid_token' not in messages_api:
+                return
+            mid = "&mid=" + messages_api['mid_token']
+            url = self.messages_url.format(self.slug, tz, mid)
+
+    def resume_jobs(self):
+        if not self.journal:
+            return []
+        jobs = self.journal.outstanding(self.slug)
+        if jobs:
+            self.log.info(
+                f"\t· Resuming {self.term.bold(str(len(jobs)))} unfinished downloads")
+        return jobs
+
+    def is_known_page(self, ids):
+        return bool(ids) and all(self.dedup.has_post(i) for i in ids)
+
+    def walk(self, listing, pages, spinner):
+        try:
+            yield from pages
+        except requests.RequestException as e:
+            spinner.fail()
+            self.failed.append(listing)
+            self.log.info(self.term.red(f"Unable to scrape {self.name}'s {listing}: {e}"))
+            if isinstance(e, requests.HTTPError):
+                self.log.info(self.term.red(self.log.STATUS_ERROR))
+            return
+        self.walked.add(listing)
+
+    def stop_early(self, listing, ids):
+        return self.incremental and self.avoid_duplicates and \
+            listing in self.complete and self.is_known_page(ids)
+
+    def scrape_messages(self, url, tz):
+        spinner = get_spinner(
+            f"Scraping your messages with {self.term.bold(self.name)}...", self.interactive)
+        spinner.start()
+        num_messages = 0
         image_urls, video_urls, audio_urls = [], [], []
-        for message in list(messages):
-            if self.avoid_duplicates and message['mid'] in self.ids:
-                pass
-            else:
-                if message['has_images']:
-                    if not message['is_locked']:
-                        type_, media_type = 'Message', 'Image'
-                        mid = message['mid']
-                        date = message['created_at']['date']
-                        ts = self.get_timestamp(date)
-                        images = message['images']
-                        for image in images:
-                            image_urls.append(
-                                (image['image'], ts, type_, media_type, date, mid))
-                    else:
-                        pass
-                if message['has_video']:
-                    if not message['is_locked']:
-                        type_, media_type = 'Message', 'Video'
-                        mid = message['mid']
-                        date = message['created_at']['date']
-                        ts = self.get_timestamp(date)
-                        video_urls.append(
-                            (message['video'], ts, type_, media_type, date, mid))
-                    else:
-                        pass
-                if message['has_audio']:
-                    if not message['is_locked']:
-                        type_, media_type = 'Message', 'Image'
-                        mid = message['mid']
-                        date = message['created_at']['date']
-                        ts = self.get_timestamp(date)
-                        audio_urls.append(
-                            (message['audio'], ts, type_, media_type, date, mid))
+        arrays = {'Image': image_urls, 'Video': video_urls, 'Audio': audio_urls}
+        for messages in self.walk('messages', self.paginate_messages(url, tz), spinner):
+            num_messages += len(messages)
+            for message in messages:
+                for media in extract_message(message):
+                    self.add(arrays[media.media_type], media)
+            mids = [message['mid'] for message in messages
+                    if not message['is_locked'] and
+                    (message['has_images'] or message['has_video'] or message['has_audio'])]
+            if self.stop_early('messages', mids):
+                self.log.debug("Reached previously downloaded messages")
+                break
+        if 'messages' not in self.failed:
+            spinner.succeed()
+        self.log.info(
+            f"\t· Found {self.term.bold(str(num_messages))} messages")
         self.log.info(
             f"\t  — Found {self.term.bold(str(len(image_urls)))} new photos")
         self.log.info(
@@ -318,78 +312,58 @@ class Model(User):
             f"\t  — Found {self.term.bold(str(len(audio_urls)))} new audios")
         return image_urls, video_urls, audio_urls
 
-    def scrape_video_store(self, num):
-        spinner = Halo(
-            text=f"Scraping {self.term.bold(self.name)}'s store videos...", color='red')
-        spinner.start()
+    def paginate_video_store(self, num):
         payload = {
-            'limit': num,
+            'limit': self.page_size,
+            'page': 0,
             'slug': self.slug,
             'privacy': [],
             'type': 'video',
         }
-        with requests.Session() as s:
-            r = s.post(self.video_store_url,
-                       headers=self.headers, params=payload)
-        if r.ok:
-            self.log.debug(self.term.lime(f"{r.status_code} STATUS CODE"))
-        else:
-            self.log.info(self.term.red(f"{r.status_code} STATUS CODE"))
-            self.log.info(self.term.red(self.log.STATUS_ERROR))
-            sys.exit(0)
-        page_meta = r.json()['page_meta']
-        total = page_meta['total']
-        payload['limit'] = total
-        with requests.Session() as s:
-            r = s.post(self.video_store_url,
-                       headers=self.headers, params=payload)
-        if r.ok:
-            spinner.succeed()
-        else:
-            spinner.fail()
-            self.log.info(self.term.red(f"{r.status_code} STATUS CODE"))
-            self.log.info(self.term.red(self.log.STATUS_ERROR))
-            sys.exit(0)
+        while payload['page'] * self.page_size < num:
+            r = self.session.post(
+                self.video_store_url, params=payload, cache=True, endpoint='store')
+            if r.ok:
+                self.log.debug(self.term.lime(f"{r.status_code} STATUS CODE"))
+            else:
+                raise requests.HTTPError(
+                    f"{r.status_code} STATUS CODE for url: {r.url}", response=r)
+            store_videos = r.json()['list']
+            yield store_videos
+            if len(store_videos) < self.page_size:
+                return
+            payload['page'] += 1
+
+    def scrape_video_store(self, num):
+        spinner = get_spinner(
+            f"Scraping {self.term.bold(self.name)}'s store videos...", self.interactive)
+        spinner.start()
         videos = []
-        store_videos = r.json()['list']
-        if store_videos:
+        for store_videos in self.walk('store', self.paginate_video_store(num), spinner):
             for video in store_videos:
-                if self.avoid_duplicates and video['uid'] in self.ids:
-                    pass
-                else:
-                    if video['can_see']:
-                        try:
-                            if 'video_url' in (video_object := video['video_object']):
-                                type_, media_type = 'Store Video', 'Video'
-                                uid = video['uid']
-                                video_url = video_object['video_url']
-                                video_url = video_url.replace('\\', '')
-                                date = video['created_at']['date']
-                                ts = self.get_timestamp(date)
-                                videos.append(
-                                    (video_url, ts, type_, media_type, date, uid))
-                        except KeyError:
-                            self.log.info(
-                                f"Unable to download '{video['title']}'")
-                    else:
-                        if self.download_preview_videos:
-                            if 'video_trailer' in (video_object := video['video_object']):
-                                type_, media_type = 'Store Video', 'Video'
-                                uid = video['uid']
-                                video_trailer = video_object['video_trailer']
-                                video_trailer.replace('\\', '')
-                                date = video['created_at']['date']
-                                ts = self.get_timestamp(date)
-                                videos.append(
-                                    (video_trailer, ts, type_, media_type, date, uid))
+                try:
+                    for media in extract_store_video(video, self.download_preview_videos):
+                        self.add(videos, media)
+                except KeyError:
+                    self.log.info(f"Unable to download '{video['title']}'")
+            uids = [video['uid'] for video in store_videos]
+            if self.stop_early('store', uids):
+                self.log.debug("Reached previously downloaded store videos")
+                break
+        if 'store' not in self.failed:
+            spinner.succeed()
         self.log.info(
             f"\t· Found {self.term.bold(str(len(videos)))} new store videos")
         return videos
 
-    def get_timestamp(self, date):
-        iso_datetime = parse(date)
-        timestamp = datetime.datetime.timestamp(iso_datetime)
-        return timestamp
+    def add(self, array, group):
+        if self.avoid_duplicates and self.dedup.seen(group[0]):
+            return
+        if self.journal:
+            self.journal.discover(self.slug, group)
+        array.append(group)
+        if self.sink:
+            self.sink(group)
 
 
 class Folder(User):
@@ -411,34 +385,104 @@ class Download(Folder):
         super().__init__(slug)
 
     def handle_download(self, array):
+        with Pipeline(self.threads, lambda *_: self, self.session.scheduler,
+                      self.prioritizer, get_engine(self), self.desc) as pipeline:
+            for group in array:
+                pipeline.submit(group, self.slug)
+        self.report_failures(pipeline.failed)
+        self.wait_for_verification()
         if self.avoid_duplicates:
-            self.conn = sqlite3.connect(os.path.join(self.db_dir, 'models.db'))
-            with closing(self.conn.cursor()) as c:
-                c.executemany(f'''
-                INSERT INTO {self.slug}(url, timestamp, type, media_type, date, file_id)
-                VALUES(?,?,?,?,?,?)''', array)
-                self.conn.commit()
-        os.makedirs(self.dir, exist_ok=True)
-        with tqdm(desc=self.desc, total=len(array), colour='red') as bar:
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                futures = {executor.submit(
-                    self.download, group): group for group in array}
-                for future in concurrent.futures.as_completed(futures):
-                    future.result
-                    bar.update(1)
+            self.db.flush()
 
     def download(self, group):
-        url, time = group[0], group[1]
+        url = group[0]
+        file_location = self.get_location(url)
+        if self.content and self.etag_check and (known := self.link_known(url, file_location)):
+            self.finish(group, file_location, *known)
+            return file_location
+        mtime = group[1] if self.use_original_dates else None
+        if self.resume:
+            split = self.prioritizer.might_reach(
+                group, self.resumable.segment_size * 2)
+            digest, etag = self.resumable.fetch(url, file_location, mtime, split)
+        else:
+            hasher = new_hasher()
+            with self.session.get(url, stream=True) as r:
+                r.raise_for_status()
+                r.raw.decode_content = True
+                size = content_length(r.headers)
+                with Writer(file_location, size=size, hasher=hasher, mtime=mtime) as writer:
+                    writer.copy(r.raw, self.session.scheduler.throttle)
+                etag = r.headers.get('ETag')
+            digest = hasher.hexdigest()
+        self.finish(group, file_location, digest, etag, dated=mtime is not None)
+        return file_location
+
+    def link_known(self, url, file_location):
+        r = self.session.head(url, allow_redirects=True)
+        if not (r.ok and (etag := r.headers.get('ETag'))):
+            return None
+        size = int(r.headers.get('Content-Length', -1))
+        if not (known := self.content.find_etag(etag, size)):
+            return None
+        path, digest = known
+        if not self.content.link(path, file_location):
+            return None
+        return digest, etag
+
+    def start(self, group):
+        if self.journal:
+            self.journal.start(self.slug, group[0])
+
+    def finish(self, group, file_location, digest=None, etag=None, dated=False):
+        if self.content and digest:
+            if self.content.store(group[0], file_location, digest, etag):
+                dated = False
+        self.set_dates(file_location, group[1], dated)
+        if self.avoid_duplicates:
+            self.db.record(self.slug, group)
+        if self.journal:
+            self.journal.done(self.slug, group[0], file_location)
+        if self.verifier:
+            self.verifier.submit(file_location, group[3],
+                                 callback=partial(self.verified, group))
+
+    def verified(self, group, future):
+        try:
+            path, status, detail, size, mtime = future.result()
+        except Exception as e:
+            self.log.debug(self.term.red(f"Unable to verify {group[0]}: {e!r}"))
+            return
+        if self.integrity:
+            self.integrity.record(path, status, detail, size, mtime)
+        if status in REJECTED:
+            self.log.info(self.term.red(f"{path} failed verification: {detail}"))
+            if self.avoid_duplicates:
+                self.db.forget(self.slug, group[0])
+            if self.journal:
+                self.journal.fail(self.slug, group[0], path)
+        elif status != OK:
+            self.log.debug(self.term.red(f"{path}: {detail}"))
+
+    def fail(self, group):
+        if self.journal:
+            self.journal.fail(self.slug, group[0], self.get_location(group[0]))
+
+    def prepare(self):
+        os.makedirs(self.dir, exist_ok=True)
+
+    def get_location(self, url):
         filename = url.rsplit('/')[-1].split('?')[0]
-        file_location = os.path.join(self.dir, filename)
-        with requests.Session() as s:
-            r = s.get(url, headers=self.headers)
-        with open(file_location, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=1024):
-                f.write(chunk)
+        if self.content:
+            return self.content.claim(self.dir, filename, url)
+        return os.path.join(self.dir, filename)
+
+    def set_dates(self, file_location, time, dated=False):
         if self.use_original_dates:
-            os.utime(file_location, (time, time))
+            if not dated:
+                os.utime(file_location, (time, time))
             if platform.system() == 'Windows':
+                from win32_setctime import setctime
                 setctime(file_location, time)
 
 
@@ -468,14 +512,45 @@ class StoreVideos(Download):
         self.dir = self.store_videos_dir
 
 
-def main():
-    with Halo(color='red'):
-        user = User()
-        following_count = user.scrape_user()
-        creators_list = user.scrape_follow(following_count)
-        model = Model(creators_list)
-    model.menu()
+def get_downloader(slug, type_, media_type):
+    if type_ == 'Timeline':
+        return Timeline(slug, f'{media_type}s')
+    if type_ == 'Message':
+        return Messages(slug, f'{media_type}s')
+    return StoreVideos(slug)
+
+
+def get_engine(user):
+    if user.engine == 'async' and user.async_engine.available():
+        return user.async_engine
+    return None
+
+
+def scrape_creator(user, model, pipeline):
+    Metrics.scope(model.slug)
     num_store_videos = model.scrape_profile()
+    if not Session.offline:
+        for group in model.resume_jobs():
+            pipeline.submit(group, model.slug)
+        model.sink = partial(pipeline.submit, slug=model.slug)
+    model.scrape_timeline()
+    messages_url = user.messages_url.format(model.slug, user.timezone, '')
+    model.scrape_messages(messages_url, user.timezone)
+    model.scrape_video_store(num_store_videos)
+    model.sink = None
+    model.record_sync()
+
+
+def scrape_phased(user, model):
+    Metrics.scope(model.slug)
+    num_store_videos = model.scrape_profile()
+    if jobs := model.resume_jobs():
+        with Pipeline(user.threads, get_downloader, user.session.scheduler,
+                      user.prioritizer, get_engine(user)) as pipeline:
+            for group in jobs:
+                pipeline.submit(group, model.slug)
+        user.report_failures(pipeline.failed)
+        user.wait_for_verification()
     images, videos, audios = model.scrape_timeline()
     if images:
         download_images = Timeline(model.slug, 'Images')
@@ -502,7 +577,184 @@ def main():
     if store_videos:
         download_store_videos = StoreVideos(model.slug)
         download_store_videos.handle_download(store_videos)
-    main()
+    model.record_sync()
+    user.write_report(model.slug)
+
+
+def expected_volume(profile):
+    if not profile:
+        return 0
+    counters, new = profile
+    counts = counters if new is None else new
+    return counts['photos'] + counts['videos'] + counts['audios']
+
+
+def scrape_batch_creator(user, pipeline, name, slug):
+    model = Model([], interactive=False)
+    model.name, model.slug = name, slug
+    scrape_creator(user, model, pipeline)
+    if model.failed:
+        raise ScrapeError(f"Unable to scrape {', '.join(model.failed)}")
+
+
+def batch(slugs):
+    user = User()
+    if slugs:
+        creators = [(slug, slug) for slug in slugs]
+    else:
+        following_count = user.scrape_user()
+        creators = [v for _, v in user.scrape_follow(following_count)]
+    if user.batch_order == 'volume':
+        prefetched = user.prefetch_profiles([slug for _, slug in creators])
+        creators.sort(key=lambda creator: expected_volume(
+            prefetched.get(creator[1])), reverse=True)
+    errors = {}
+    start = time.time()
+    with Pipeline(user.threads, get_downloader, user.session.scheduler,
+                  user.prioritizer, get_engine(user)) as pipeline:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=user.batch_creators) as executor:
+            futures = {executor.submit(
+                scrape_batch_creator, user, pipeline, *creator): creator[1] for creator in creators}
+            for future in concurrent.futures.as_completed(futures):
+                if exception := future.exception():
+                    errors[futures[future]] = exception
+    user.report_failures(pipeline.failed)
+    user.wait_for_verification()
+    if user.avoid_duplicates:
+        user.db.flush()
+    header = ['HANDLE', 'FOUND', 'DOWNLOADED', 'FAILED', 'STATUS']
+    FORMAT = '{:<22}' * len(header)
+    user.log.info(user.term.underline(FORMAT.format(*header)))
+    for _, slug in creators:
+        stats = pipeline.stats[slug]
+        status = user.term.red('error') if slug in errors else user.term.lime('ok')
+        user.log.info(FORMAT.format(
+            slug, stats['queued'], stats['downloaded'], stats['failed'], status))
+    for _, slug in creators:
+        user.write_report(slug)
+    for slug, exception in errors.items():
+        user.log.debug(user.term.red(f"{slug}: {exception!r}"))
+    user.log.info(
+        f"Finished {len(creators)} creators in {time.time() - start:.0f} seconds")
+    return not errors and not pipeline.failed
+
+
+def interactive():
+    with get_spinner():
+        user = User()
+        following_count = user.scrape_user()
+        creators_list = user.scrape_follow(following_count)
+        prefetched = user.prefetch_profiles([v[1] for _, v in creators_list])
+        model = Model(creators_list, prefetched=prefetched)
+    while True:
+        model.menu()
+        try:
+            if user.pipeline or Session.offline:
+                with Pipeline(user.threads, get_downloader, user.session.scheduler,
+                              user.prioritizer, get_engine(user)) as pipeline:
+                    scrape_creator(user, model, pipeline)
+                user.report_failures(pipeline.failed)
+                user.wait_for_verification()
+                if user.avoid_duplicates:
+                    user.db.flush()
+                user.write_report(model.slug)
+            else:
+                scrape_phased(user, model)
+        except requests.RequestException as e:
+            user.log.info(user.term.red(f"Unable to scrape {model.name}: {e}"))
+
+
+def archived_urls(db, slugs):
+    urls = {}
+    for slug in slugs:
+        for (url,) in db.fetchall(
+                'SELECT url FROM media WHERE slug = ? UNION SELECT url FROM jobs WHERE slug = ?',
+                (slug, slug)):
+            key = media_key(url)
+            urls[slug, key] = urls[slug, os.path.basename(key)] = url
+    return urls
+
+
+def verify_archive(slugs):
+    user = User()
+    if user.verifier is None:
+        user.verifier = Verifier(user.verify_workers)
+    if not slugs:
+        if not user.avoid_duplicates:
+            user.log.info(user.term.red(
+                "Pass the handles of the creators to check when avoid_duplicates is off"))
+            return
+        slugs = sorted(slug for (slug,) in user.db.fetchall(
+            'SELECT slug FROM media UNION SELECT slug FROM profiles'))
+    digests, keys = {}, {}
+    if user.content:
+        for path, key, digest in user.db.fetchall('SELECT path, key, hash FROM files'):
+            digests[path], keys[path] = digest, key
+    urls = archived_urls(user.db, slugs) if user.avoid_duplicates else {}
+    futures = {}
+    unchanged = 0
+    for slug in slugs:
+        for directory, _, files in os.walk(os.path.join(user.destination_path, slug)):
+            for name in files:
+                path = os.path.join(directory, name)
+                if not (media_type := media_type_of(path)):
+                    continue
+                stat = os.stat(path)
+                if user.integrity and user.integrity.unchanged(path, stat.st_size, stat.st_mtime):
+                    unchanged += 1
+                    continue
+                futures[user.verifier.submit(
+                    path, media_type, digests.get(path))] = slug, path
+    counts = collections.Counter()
+    for future in concurrent.futures.as_completed(futures):
+        try:
+            path, status, detail, size, mtime = future.result()
+        except Exception as e:
+            counts['error'] += 1
+            user.log.info(user.term.red(f"Unable to check {futures[future][1]}: {e!r}"))
+            continue
+        if user.integrity:
+            user.integrity.record(path, status, detail, size, mtime)
+        counts[status] += 1
+        if status != OK:
+            user.log.info(user.term.red(f"{path}: {detail}"))
+        slug = futures[future][0]
+        if status in REJECTED and (url := urls.get((slug, keys.get(path, os.path.basename(path))))):
+            user.db.forget(slug, url)
+            if user.journal:
+                user.journal.fail(slug, url, path)
+    user.verifier.close()
+    if user.avoid_duplicates:
+        user.db.flush()
+    failed = len(futures) - counts[OK]
+    user.log.info(
+        f"Checked {len(futures)} files ({unchanged} unchanged since the last check): "
+        f"{counts[OK]} ok, {failed} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Download photos and videos from your favorite creators on LoyalFans')
+    parser.add_argument('slugs', nargs='*',
+                        help="creator handles to download without prompting")
+    parser.add_argument('--all', action='store_true',
+                        help="download every creator you follow without prompting")
+    parser.add_argument('--offline', action='store_true',
+                        help="replay cached API responses without downloading anything")
+    parser.add_argument('--verify', action='store_true',
+                        help="check the files already downloaded for the given creators, or all of them")
+    args = parser.parse_args()
+    Session.offline = args.offline
+    try:
+        if args.verify:
+            verify_archive(args.slugs)
+        elif args.all or args.slugs:
+            if not batch(args.slugs):
+                sys.exit(1)
+        else:
+            interactive()
+    except requests.RequestException as e:
+        sys.exit(f"Unable to reach LoyalFans: {e}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,71 @@
+import datetime
+from collections import namedtuple
+
+
+Media = namedtuple(
+    'Media', ['url', 'timestamp', 'type', 'media_type', 'date', 'file_id'])
+
+
+def get_timestamp(date):
+    try:
+        iso_datetime = datetime.datetime.fromisoformat(date)
+    except ValueError:
+        from dateutil.parser import parse
+        iso_datetime = parse(date)
+    return datetime.datetime.timestamp(iso_datetime)
+
+
+def clean(url):
+    return url.replace('\\', '')
+
+
+def extract_post(post, download_preview_videos):
+    if not (post['photo'] or post['video'] or post['audio']):
+        return
+    uid = post['uid']
+    date = post['created_at']['date']
+    ts = get_timestamp(date)
+    if post['photo'] and 'photos' in (has_photos := post['photos']):
+        for photo in has_photos['photos']:
+            yield Media(clean(photo['images']['original']), ts,
+                        'Timeline', 'Image', date, uid)
+    if post['video']:
+        video_object = post['video_object']
+        if 'video_url' in video_object:
+            yield Media(clean(video_object['video_url']), ts,
+                        'Timeline', 'Video', date, uid)
+        elif 'video_trailer' in video_object and download_preview_videos:
+            yield Media(clean(video_object['video_trailer']), ts,
+                        'Timeline', 'Video', date, uid)
+    if post['audio'] and 'audio_url' in (audio_object := post['audio_object']):
+        yield Media(clean(audio_object['audio_url']), ts,
+                    'Timeline', 'Audio', date, uid)
+
+
+def extract_message(message):
+    if message['is_locked'] or not (message['has_images'] or message['has_video'] or message['has_audio']):
+        return
+    mid = message['mid']
+    date = message['created_at']['date']
+    ts = get_timestamp(date)
+    if message['has_images']:
+        for image in message['images']:
+            yield Media(image['image'], ts, 'Message', 'Image', date, mid)
+    if message['has_video']:
+        yield Media(message['video'], ts, 'Message', 'Video', date, mid)
+    if message['has_audio']:
+        yield Media(message['audio'], ts, 'Message', 'Audio', date, mid)
+
+
+def extract_store_video(video, download_preview_videos):
+    video_object = video['video_object']
+    if video['can_see']:
+        key = 'video_url'
+    elif download_preview_videos:
+        key = 'video_trailer'
+    else:
+        return
+    if key in video_object:
+        date = video['created_at']['date']
+        yield Media(clean(video_object[key]), get_timestamp(date),
+                    'Store Video', 'Video', date, video['uid'])
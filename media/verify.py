@@ -0,0 +1,122 @@
+import os
+import threading
+import multiprocessing
+import concurrent.futures
+from functools import partial
+
+from database.content import hash_file
+
+HEAD_SIZE = 512
+
+OK = 'ok'
+MISSING = 'missing'
+EMPTY = 'empty'
+ERROR_PAGE = 'error-page'
+UNKNOWN = 'unknown'
+MISMATCH = 'mismatch'
+CORRUPT = 'corrupt'
+REJECTED = (MISSING, EMPTY, ERROR_PAGE, MISMATCH)
+
+EXTENSIONS = {
+    'Image': ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.bmp'),
+    'Video': ('.mp4', '.m4v', '.mov', '.webm', '.mkv', '.avi', '.flv', '.ts'),
+    'Audio': ('.mp3', '.m4a', '.aac', '.wav', '.ogg', '.oga', '.opus', '.flac'),
+}
+
+AUDIO_BRANDS = (b'M4A ', b'M4B ', b'M4P ', b'F4A ', b'F4B ')
+IMAGE_BRANDS = (b'heic', b'heix', b'mif1', b'msf1', b'avif')
+
+
+def sniff(head):
+    if head.startswith(b'\xff\xd8\xff') or head.startswith(b'\x89PNG\r\n\x1a\n') \
+            or head[:6] in (b'GIF87a', b'GIF89a') or head.startswith(b'BM') \
+            or head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'Image'
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        if brand in AUDIO_BRANDS:
+            return 'Audio'
+        if brand in IMAGE_BRANDS:
+            return 'Image'
+        return 'Video'
+    if head.startswith(b'\x1a\x45\xdf\xa3') or head.startswith(b'FLV') \
+            or head[:4] == b'RIFF' and head[8:12] == b'AVI ' \
+            or len(head) > 188 and head[0] == head[188] == 0x47:
+        return 'Video'
+    if head.startswith(b'ID3') or head.startswith(b'OggS') or head.startswith(b'fLaC') \
+            or head[:4] == b'RIFF' and head[8:12] == b'WAVE' \
+            or len(head) > 1 and head[0] == 0xff and head[1] & 0xe0 == 0xe0:
+        return 'Audio'
+    text = head.lstrip().lower()
+    if text.startswith((b'<!doctype', b'<html', b'<?xml', b'<head', b'<body', b'{')):
+        return 'text'
+    return None
+
+
+def media_type_of(path):
+    extension = os.path.splitext(path)[1].lower()
+    for media_type, extensions in EXTENSIONS.items():
+        if extension in extensions:
+            return media_type
+    return None
+
+
+def verify(path, media_type=None, digest=None):
+    try:
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            head = f.read(HEAD_SIZE)
+    except FileNotFoundError:
+        return path, MISSING, 'file not found', 0, 0
+    kind = sniff(head)
+    if not stat.st_size:
+        status, detail = EMPTY, 'file is empty'
+    elif kind == 'text':
+        status, detail = ERROR_PAGE, 'an error page was saved instead of the media'
+    elif kind is None:
+        status, detail = UNKNOWN, f'unrecognized content {head[:8].hex()}'
+    elif media_type == 'Image' and kind != 'Image' or media_type in ('Video', 'Audio') and kind == 'Image':
+        status, detail = MISMATCH, f'expected {media_type.lower()} but found {kind.lower()}'
+    else:
+        status, detail = OK, kind
+    if status == OK and digest:
+        if hash_file(path).hexdigest() != digest:
+            status, detail = CORRUPT, 'content changed since download'
+    return path, status, detail, stat.st_size, stat.st_mtime
+
+
+class Verifier:
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = None
+        self.pending = 0
+        self.lock = threading.Condition()
+
+    def submit(self, path, media_type=None, digest=None, callback=None):
+        with self.lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+            future = self.executor.submit(verify, path, media_type, digest)
+            self.pending += 1
+        future.add_done_callback(partial(self._done, callback))
+        return future
+
+    def _done(self, callback, future):
+        try:
+            if callback:
+                callback(future)
+        finally:
+            with self.lock:
+                self.pending -= 1
+                self.lock.notify_all()
+
+    def wait(self):
+        with self.lock:
+            self.lock.wait_for(lambda: not self.pending)
+
+    def close(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor:
+            executor.shutdown(wait=True)
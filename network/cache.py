@@ -0,0 +1,107 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+
+import requests
+
+
+class ResponseCache:
+    _lock = threading.Lock()
+    _size = None
+
+    def __init__(self, directory, config):
+        self.directory = directory
+        self.ttl = config['ttl']
+        self.max_size = config['max_size']
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, method, url, params):
+        params = sorted((params or {}).items())
+        raw = json.dumps([method.upper(), url, params], default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.json.gz')
+
+    def load(self, key):
+        try:
+            with gzip.open(self.path(key), 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(self.path(key))
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry['time'] < self.ttl
+
+    def validators(self, entry):
+        headers = {}
+        if etag := entry['headers'].get('ETag'):
+            headers['If-None-Match'] = etag
+        if modified := entry['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = modified
+        return headers
+
+    def store(self, key, r):
+        entry = {
+            'time': time.time(),
+            'url': r.url,
+            'status': r.status_code,
+            'headers': {k: v for k, v in r.headers.items() if k in ('ETag', 'Last-Modified', 'Content-Type')},
+            'body': r.text,
+        }
+        self.write(key, entry)
+
+    def refresh(self, key, entry):
+        entry['time'] = time.time()
+        self.write(key, entry)
+
+    def write(self, key, entry):
+        path = self.path(key)
+        temp = f'{path}.tmp'
+        with gzip.open(temp, 'wt', encoding='utf-8') as f:
+            json.dump(entry, f)
+        with ResponseCache._lock:
+            old = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp, path)
+            if ResponseCache._size is None:
+                ResponseCache._size = self.total_size()
+            else:
+                ResponseCache._size += os.path.getsize(path) - old
+            if ResponseCache._size > self.max_size:
+                self.evict()
+
+    def total_size(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory)
+                   if entry.name.endswith('.json.gz'))
+
+    def evict(self):
+        entries = sorted((entry for entry in os.scandir(self.directory)
+                          if entry.name.endswith('.json.gz')),
+                         key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if ResponseCache._size <= self.max_size * 0.9:
+                break
+            ResponseCache._size -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def response(self, entry):
+        r = requests.Response()
+        r.status_code = entry['status']
+        r.url = entry['url']
+        r.headers.update(entry['headers'])
+        r._content = entry['body'].encode('utf-8')
+        r.encoding = 'utf-8'
+        return r
+
+    def miss(self, url):
+        r = requests.Response()
+        r.status_code = 504
+        r.url = url
+        r.reason = 'Not cached'
+        r._content = b''
+        return r
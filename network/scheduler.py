@@ -0,0 +1,60 @@
+import time
+import random
+import threading
+import email.utils
+
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        if not self.rate:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens +
+                              (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return max(0, -self.tokens / self.rate)
+
+    def acquire(self, amount=1):
+        if delay := self.reserve(amount):
+            time.sleep(delay)
+
+
+class Scheduler:
+    def __init__(self, config):
+        self.max_retries = config['max_retries']
+        self.backoff_factor = config['backoff_factor']
+        self.max_backoff = config['max_backoff']
+        self.requests = TokenBucket(
+            config['requests_per_second'], max(1, config['burst']))
+        self.bandwidth = TokenBucket(
+            config['bandwidth'], max(1, config['bandwidth']))
+
+    def should_retry(self, status, attempt):
+        return status in RETRY_STATUSES and attempt < self.max_retries
+
+    def backoff(self, attempt, retry_after=None):
+        if retry_after:
+            if retry_after.isdigit():
+                return min(self.max_backoff, int(retry_after))
+            try:
+                date = email.utils.parsedate_to_datetime(retry_after)
+            except (TypeError, ValueError):
+                date = None
+            if date:
+                return min(self.max_backoff, max(0, date.timestamp() - time.time()))
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+    def throttle(self, nbytes):
+        self.bandwidth.acquire(nbytes)
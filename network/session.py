@@ -0,0 +1,115 @@
+import time
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from logs.metrics import Metrics
+from network.scheduler import Scheduler
+
+
+class Session:
+    _session = None
+    _scheduler = None
+    _lock = threading.Lock()
+    offline = False
+
+    def __init__(self, headers, config, cache=None):
+        self.threads = config['threads']
+        self.timeout = config['timeout']
+        self.cache = cache
+        with Session._lock:
+            if Session._session is None:
+                Session._session = self._build(headers, config)
+                Session._scheduler = Scheduler(config)
+        self.session = Session._session
+        self.scheduler = Session._scheduler
+
+    def _build(self, headers, config):
+        retry = Retry(
+            total=config['max_retries'],
+            backoff_factor=config['backoff_factor'],
+            allowed_methods=None,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=config['pool_connections'],
+            pool_maxsize=self.threads,
+            max_retries=retry,
+            pool_block=True,
+        )
+        session = requests.Session()
+        session.headers.update(headers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def request(self, method, url, cache=False, endpoint=None, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        limited = endpoint is not None
+        endpoint = endpoint or urlsplit(url).netloc
+        if cache and self.cache:
+            return self.cached(method, url, endpoint, limited, **kwargs)
+        return self.send(method, url, endpoint, limited, **kwargs)
+
+    def send(self, method, url, endpoint, limited=True, **kwargs):
+        attempt = 0
+        while True:
+            if limited:
+                self.scheduler.requests.acquire()
+            start = time.perf_counter()
+            try:
+                r = self.session.request(method, url, **kwargs)
+            except requests.RequestException:
+                Metrics.http(endpoint, 'error', 0,
+                             time.perf_counter() - start, retries=attempt)
+                raise
+            if not self.scheduler.should_retry(r.status_code, attempt):
+                if kwargs.get('stream'):
+                    Metrics.http(endpoint, r.status_code, 0, r.elapsed.total_seconds(),
+                                 r.elapsed.total_seconds(), attempt)
+                else:
+                    Metrics.http(endpoint, r.status_code, len(r.content),
+                                 time.perf_counter() - start, r.elapsed.total_seconds(), attempt)
+                return r
+            delay = self.scheduler.backoff(
+                attempt, r.headers.get('Retry-After'))
+            r.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def cached(self, method, url, endpoint, limited=True, **kwargs):
+        key = self.cache.key(method, url, kwargs.get('params'))
+        entry = self.cache.load(key)
+        if entry and (Session.offline or self.cache.is_fresh(entry)):
+            Metrics.http(endpoint, 'cached', 0, 0)
+            return self.cache.response(entry)
+        if Session.offline:
+            return self.cache.miss(url)
+        if entry:
+            kwargs['headers'] = {**kwargs.get('headers', {}),
+                                 **self.cache.validators(entry)}
+        r = self.send(method, url, endpoint, limited, **kwargs)
+        if r.status_code == 304 and entry:
+            self.cache.refresh(key, entry)
+            return self.cache.response(entry)
+        if r.ok:
+            self.cache.store(key, r)
+        return r
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    @classmethod
+    def close(cls):
+        with cls._lock:
+            if cls._session is not None:
+                cls._session.close()
+                cls._session = None